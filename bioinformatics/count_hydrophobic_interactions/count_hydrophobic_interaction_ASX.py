@@ -12,73 +12,122 @@ import __main__
 import pandas as pd
 import sys
 import datetime
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'motif search'))
+from journal import Journal, csv_cells
+from structure_source import StructureSource, load_pymol, load_structure
+from coord_store import open_store
+from hydrophobic_contacts import SideChainCarbons, CONTACT_PAIRS, motif_contacts, parse_pairs
+import motif_store
 
 
 # In[9]:
 
 
-def read_hydrophobic(csv, name):
-    data = pd.read_csv(csv)
-    pdb = list(data.iloc[:,1])
-    chain = list(data.iloc[:,2])
-    start = list(data.iloc[:,3])
-    seq = list(data.iloc[:,6])
-    final = []
+# residues of the sequence column of the output (the slices of the sequence
+# string in the csv), as offsets from the motif start
+SUB_SEQUENCE = (-2, 3, 4)
+
+
+def read_hydrophobic(csv, name, resume=False, pairs=CONTACT_PAIRS, cutoff=4.5, backend='pymol', PDB_path='PDB_10000_final', prefetch=4, store=None):
+    """
+    resume: skip the motifs already recorded in name.journal.jsonl
+    pairs: residue pairs tested, as offsets from the motif start (see hydrophobic_contacts.py)
+    cutoff: side-chain carbon contact distance (A)
+    backend: 'pymol', or 'numpy' to read the structures with structure.py,
+    which keeps only the atoms of the motif chains
+    PDB_path: folder with the <pdb id>.pdb, .cif or .bcif files (optionally
+    .gz), or a divided mirror; prefetch: number of files read ahead in
+    background threads (structure_source.py)
+    store: a coordinate store compiled from PDB_path (coord_store.py) the
+    structures are taken from instead, with the NumPy backend; no file is
+    read then
+    csv: the output csv of get_seq_sec_dihed, or its motif store (.npy); the
+    contacts also go to the motif store name.npy
+    """
+    if len(pairs) > motif_store.MAX_PAIRS:
+        raise ValueError('at most {} residue pairs fit the motif store'.format(motif_store.MAX_PAIRS))
+    motifs = motif_store.read_motifs(csv)
+    pdb = motifs['pdb'].tolist()
+    chain = motifs['chain'].tolist()
+    start = motifs['start'].tolist()
+    records = np.array(motifs)
+    seq = None if csv.endswith('.npy') else list(pd.read_csv(csv).iloc[:,6])
+    groups = {}
     for i in range(len(pdb)):
-        cmd.reinitialize()
-        inter = []
-        sub_seq = [seq[i][2:5], seq[i][-19:-16], seq[i][-12:-9]]
-        pocket = []
-        #print(sub_seq)
-        mol = cmd.load('PDB_10000_final/' + pdb[i] + '.pdb', 'test')
-        cmd.remove('hydrogen')
-        #1-6
-        cmd.select('sele, test & c. ' + chain[i] + ' & i. ' + str(start[i]-1) + ' & e. C &! n. C+CA+N+O' + ' within 4.5 of test & c. ' + chain[i] + ' & i. ' + str(start[i] + 4) + ' & e. C &! n. C+CA+N+O', state=1)
-        sele_list = cmd.index('sele')
-        pocket.append(sele_list)
-        #print(sele_list)
-        if sele_list != []:
-            inter.append(1)
-        else:
-            inter.append(0)
-        cmd.deselect()
-        #1-5
-        cmd.reinitialize()
-        mol = cmd.load('PDB_10000_final/' + pdb[i] + '.pdb', 'test')
-        cmd.remove('hydrogen')
-        cmd.select('sele, test & c. ' + chain[i] + ' & i. ' + str(start[i]-1) + ' & e. C &! n. C+CA+N+O' + ' within 4.5 of test & c. ' + chain[i] + ' & i. ' + str(start[i] + 3) + ' & e. C &! n. C+CA+N+O', state=1)
-        sele_list = cmd.index('sele')
-        pocket.append(sele_list)
-        #print(sele_list)
-        if sele_list != []:
-            inter.append(1)
+        groups.setdefault(pdb[i], []).append(i)
+    journal = Journal(name + '.journal.jsonl', resume)
+    key = lambda i: '{}/{}/{}/{}'.format(i, pdb[i], chain[i], start[i])
+    rows = {}
+    todo = []
+    for pdb_id, group in groups.items():
+        # journals of earlier versions hold only the csv row; redo those
+        if all(isinstance(journal.done.get(key(i)), dict) for i in group):
+            for i in group:
+                rows[i] = journal.done[key(i)]['row']
+                records['contacts'][i, :len(pairs)] = journal.done[key(i)]['contacts']
         else:
-            inter.append(0)
-        cmd.deselect()
-        #5-6
-        cmd.reinitialize()
-        mol = cmd.load('PDB_10000_final/' + pdb[i] + '.pdb', 'test')
-        cmd.remove('hydrogen')
-        cmd.select('sele, test & c. ' + chain[i] + ' & i. ' + str(start[i]+3) + ' & e. C &! n. C+CA+N+O' + ' within 4.5 of test & c. ' + chain[i] + ' & i. ' + str(start[i] + 4) + ' & e. C &! n. C+CA+N+O', state=1)
-        sele_list = cmd.index('sele')
-        pocket.append(sele_list)
-        #print(sele_list)
-        if sele_list != []:
-            inter.append(1)
+            todo.append(pdb_id)
+    if store is not None:
+        backend = 'numpy'
+        files = ((pdb_id, None) for pdb_id in todo)
+    else:
+        files = StructureSource(PDB_path, prefetch).prefetch(todo)
+    for pdb_id, structure_file in files:
+        group = groups[pdb_id]
+        chains = {str(chain[i]) for i in group}
+        if store is not None:
+            structure = open_store(store).structure(pdb_id, chains)
+            if structure is None:
+                raise FileNotFoundError('{} is not in the coordinate store {}'.format(pdb_id, store))
+        elif structure_file is None:
+            raise FileNotFoundError('no structure file for {} in {}'.format(pdb_id, PDB_path))
+        elif backend == 'numpy':
+            structure = load_structure(structure_file, chains)
+        # one load per PDB; N'-N4, N'-N3 and N3-N4 of every motif in it
+        # are tested on the same coordinates, without solvent and ligands
+        # as in the search (and pipeline.py)
+        if backend == 'numpy':
+            structure = structure.strip().remove_hydrogens()
+            carbons = SideChainCarbons('test', model=structure.get_model())
         else:
-            inter.append(0)
-        #print(inter)
-        final.append([sub_seq,inter, pocket])
-        if i > 0 and i%50 == 0:
-            df = pd.DataFrame(final)
-            df.to_csv(name + '.csv')
+            cmd.reinitialize()
+            load_pymol(structure_file, 'test')
+            cmd.remove('solvent')
+            cmd.remove('ino.')
+            cmd.remove('org.')
+            cmd.remove('hydrogen')
+            carbons = SideChainCarbons('test')
+        for i in group:
+            if seq is None:
+                sub_seq = [motif_store.residue_name(records['sequence'][i][k - motif_store.WINDOW[0]]) for k in SUB_SEQUENCE]
+            else:
+                sub_seq = [seq[i][2:5], seq[i][-19:-16], seq[i][-12:-9]]
+            inter, pocket = motif_contacts(carbons, str(chain[i]), start[i], pairs, cutoff)
+            rows[i] = csv_cells([sub_seq,inter, pocket])
+            records['contacts'][i, :len(pairs)] = inter
+        journal.record({key(i): {'row': rows[i], 'contacts': records['contacts'][i, :len(pairs)].tolist()} for i in group})
+    journal.close()
+    final = [rows[i] for i in range(len(pdb))]
     final = pd.DataFrame(final)
     final.to_csv(name + '.csv')
+    motif_store.save(name + '.npy', records)
 
 
 # In[136]:
 
 
 if __name__== "__main__":
-    read_hydrophobic(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser()
+    parser.add_argument('csv', help='motif csv with sequences (output of get_seq_sec_dihed), or its .npy motif store')
+    parser.add_argument('name', help='output name, written to <name>.csv')
+    parser.add_argument('--resume', action='store_true', help='skip the motifs already in <name>.journal.jsonl')
+    parser.add_argument('--pairs', type=parse_pairs, default=CONTACT_PAIRS, help="residue pairs to test, e.g. \"N'-N4,N'-N3,N3-N4,N'-N2,N1-N4\" (default N'-N4,N'-N3,N3-N4)")
+    parser.add_argument('--cutoff', type=float, default=4.5, help='side-chain carbon contact distance in A (default 4.5)')
+    parser.add_argument('--backend', choices=['pymol', 'numpy'], default='pymol', help='structure handling with PyMOL (default) or the PyMOL-free NumPy loader')
+    parser.add_argument('--pdb-path', default='PDB_10000_final', help='folder with <pdb id>.pdb, .cif or .bcif files, optionally .gz, or a divided mirror (default %(default)s)')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read ahead in background threads (default 4, 0 for none)')
+    parser.add_argument('--store', help='coordinate store compiled from the structure files by coord_store.py, read with the NumPy backend instead of them')
+    args = parser.parse_args()
+    read_hydrophobic(args.csv, args.name, args.resume, args.pairs, args.cutoff, args.backend, args.pdb_path, args.prefetch, args.store)
 
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from scipy.spatial import cKDTree
+from pymol import cmd
+
+
+# motif positions relative to the motif start i (the Asx/Ser/Thr residue)
+POSITIONS = {"N'": -1, 'Ncap': 0, 'N1': 1, 'N2': 2, 'N3': 3, 'N4': 4}
+
+# residue pairs tested for side-chain carbon contacts, in the order of the
+# output vector: N'-N4, N'-N3, N3-N4
+CONTACT_PAIRS = [(-1, 4), (-1, 3), (3, 4)]
+
+
+class SideChainCarbons:
+    """
+    SideChainCarbons -- side-chain carbons ('e. C &! n. C+CA+N+O') of a
+    loaded object, pulled out of PyMOL once and grouped by (chain, resi).
+
+    Replaces one reinitialize/load/select round per contact test: every
+    motif of the structure is answered from the same coordinate array.
+    Neighbours are found with one KD-tree per chain and cutoff, which gives
+    all side-chain carbon contacts of the chain in a single query, so
+    further residue pairs or motifs cost only dict lookups.
+    """
+
+    def __init__(self, selection, state=1, model=None):
+        # model: all atoms of the object, when they do not come from PyMOL (Structure.get_model)
+        if model is None:
+            model = cmd.get_model(selection, state=state)
+        atoms = [at for at in model.atom if at.symbol == 'C' and at.name not in ('C', 'CA', 'N', 'O')]
+        # residues of every chain in sequence order, for the motif offsets
+        self.sequence = {}
+        for at in model.atom:
+            self.sequence.setdefault(at.chain, {})[at.resi] = None
+        self.sequence = {chain: list(residues) for chain, residues in self.sequence.items()}
+        self.position = {(chain, resi): k for chain, residues in self.sequence.items() for k, resi in enumerate(residues)}
+        self.object = selection
+        self.coord = np.array([at.coord for at in atoms], dtype=float).reshape(-1, 3)
+        # atom index in the object, as returned by cmd.index
+        self.atom_index = [at.index for at in atoms]
+        self.resi = [at.resi for at in atoms]
+        self.residues = {}
+        self.chains = {}
+        for n, at in enumerate(atoms):
+            self.residues.setdefault((at.chain, at.resi), []).append(n)
+            self.chains.setdefault(at.chain, []).append(n)
+        self.touching = {}
+
+    def neighbours(self, chain, cutoff=4.5):
+        """ for every side-chain carbon of chain, the residues with a side-chain carbon within cutoff of it """
+        if (chain, cutoff) not in self.touching:
+            rows = self.chains.get(chain, [])
+            # an atom is within any cutoff of itself, as in PyMOL's 'within'
+            touching = {n: {self.resi[n]} for n in rows}
+            if len(rows) > 1:
+                tree = cKDTree(self.coord[rows])
+                for i, j in tree.query_pairs(cutoff, output_type='ndarray'):
+                    a, b = rows[i], rows[j]
+                    touching[a].add(self.resi[b])
+                    touching[b].add(self.resi[a])
+            self.touching[(chain, cutoff)] = touching
+        return self.touching[(chain, cutoff)]
+
+    def residue(self, chain, start, offset):
+        """ resi of the residue offset positions after start in the chain (not start + offset by number), None past the ends """
+        k = self.position.get((chain, str(start)))
+        residues = self.sequence.get(chain, [])
+        if k is None or not 0 <= k + offset < len(residues):
+            return None
+        return residues[k + offset]
+
+    def contacts(self, chain, resi_a, resi_b, cutoff=4.5):
+        """
+        side-chain carbons of residue resi_a within cutoff of a side-chain
+        carbon of residue resi_b, as the (object, index) list of
+        cmd.index('c. chain & i. resi_a ... within cutoff of c. chain & i. resi_b ...')
+        """
+        touching = self.neighbours(chain, cutoff)
+        return [(self.object, self.atom_index[n]) for n in self.residues.get((chain, str(resi_a)), [])
+                if str(resi_b) in touching[n]]
+
+
+def motif_contacts(carbons, chain, start, pairs=CONTACT_PAIRS, cutoff=4.5):
+    """
+    motif_contacts -- hydrophobic contacts of the motif starting at residue start
+    (its resi); the pair offsets count residues along the chain.
+
+    RETURNS
+        inter
+            1 or 0 per residue pair in pairs: side-chain carbons in contact or not
+        pocket
+            per residue pair, the contacting atoms of its first residue
+    """
+    inter = []
+    pocket = []
+    for a, b in pairs:
+        resi_a, resi_b = carbons.residue(chain, start, a), carbons.residue(chain, start, b)
+        sele_list = carbons.contacts(chain, resi_a, resi_b, cutoff) if resi_a and resi_b else []
+        pocket.append(sele_list)
+        if sele_list != []:
+            inter.append(1)
+        else:
+            inter.append(0)
+    return inter, pocket
+
+
+def parse_pairs(text):
+    """ residue pairs from the command line, e.g. "N'-N4,N1-N4" -> [(-1, 4), (1, 4)] """
+    pairs = []
+    for pair in text.split(','):
+        a, b = pair.strip().split('-')
+        pairs.append((POSITIONS[a], POSITIONS[b]))
+    return pairs
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'motif search'))
+import motif_store
+from motif_annotation import ASX_WINDOWS, FAMILY_WINDOWS
+from motif_classes import FAMILIES, MOTIF_RULES
+
+
+# nonredundant chains searched for the PDB Nov. 2020 release
+ALL_CHAINS = 62682
+CLASSES = [name for name, mask in MOTIF_RULES]
+# residues of the phi_psi column, i-1 to i+5; the notebooks only take the
+# motifs with phi and psi of all seven
+DIHEDRAL_OFFSETS = np.arange(-1, 6)
+
+
+def _slots(offsets):
+    return np.asarray(offsets) - motif_store.WINDOW[0]
+
+
+def _long(records, field, offsets=motif_store.WINDOW):
+    """ one row per (motif, window slot) of field: class, position (offset from i), value """
+    values = records[field][:, _slots(offsets)]
+    return pd.DataFrame({'class': np.repeat(records['class'], len(offsets)),
+                         'position': np.tile(offsets, len(records)),
+                         field: values.ravel()})
+
+
+def class_counts(records):
+    """ number and ratio of the motifs of each class, and how many of them are at a surface """
+    df = pd.DataFrame({'class': records['class'], 'surface': records['surface']})
+    counts = df.groupby('class')['surface'].agg(['size', 'sum']).reindex(CLASSES, fill_value=0)
+    counts.columns = ['motifs', 'surface']
+    counts['ratio'] = counts['motifs'] / max(len(records), 1)
+    counts['surface_ratio'] = counts['surface'] / counts['motifs'].where(counts['motifs'] > 0)
+    return counts
+
+
+def secondary_structure(records, family='ASX'):
+    """
+    secondary structure distribution per class: the fraction of the motifs
+    of a class with each composition, the distinct DSSP codes of the
+    family's window in order of appearance, 'Missing' for a residue without
+    one, as the secondary-structure column of the csv writes them
+    (e.g. "['H', 'Missing']")
+    """
+    dssp = np.asarray(records['dssp'])[:, _slots(np.arange(*FAMILY_WINDOWS.get(family, ASX_WINDOWS)['secondary']))]
+    # compositions are worked out once per distinct window, not per motif
+    windows, inverse = np.unique(dssp, axis=0, return_inverse=True)
+    names = np.array([str(list(dict.fromkeys(c.decode() or 'Missing' for c in w))) for w in windows])
+    df = pd.DataFrame({'class': records['class'], 'composition': names[inverse.ravel()]})
+    return df.groupby('class')['composition'].value_counts(normalize=True).rename('ratio')
+
+
+def residue_abundance(records, family='ASX'):
+    """
+    fraction of each residue at each position of the family's sequence
+    window, per class, over the motifs with the whole window
+    """
+    offsets = np.arange(*FAMILY_WINDOWS.get(family, ASX_WINDOWS)['sequence'])
+    records = records[(records['sequence'][:, _slots(offsets)] >= 0).all(axis=1)]
+    df = _long(records, 'sequence', offsets)
+    df = df.assign(residue=np.array(motif_store.RESIDUE_NAMES + ['UNK'])[df['sequence']])
+    return df.groupby(['class', 'position'])['residue'].value_counts(normalize=True).rename('ratio')
+
+
+def dihedral_statistics(records):
+    """
+    circular mean and standard deviation (degrees) of phi and psi at each
+    position from i-1 to i+5, per class, over the motifs with both angles at
+    all seven
+    """
+    slots = _slots(DIHEDRAL_OFFSETS)
+    records = records[np.isfinite(records['phi'][:, slots]).all(axis=1) & np.isfinite(records['psi'][:, slots]).all(axis=1)]
+    df = _long(records, 'phi', DIHEDRAL_OFFSETS)
+    df['psi'] = records['psi'][:, slots].ravel()
+    for angle in ('phi', 'psi'):
+        radians = np.radians(df[angle].astype(float))
+        df[angle + '_sin'] = np.sin(radians)
+        df[angle + '_cos'] = np.cos(radians)
+    grouped = df.groupby(['class', 'position'])
+    means = grouped[['phi_sin', 'phi_cos', 'psi_sin', 'psi_cos']].mean()
+    stats = pd.DataFrame({'n': grouped.size()})
+    for angle in ('phi', 'psi'):
+        s, c = means[angle + '_sin'], means[angle + '_cos']
+        stats[angle + '_mean'] = np.degrees(np.arctan2(s, c))
+        # circular standard deviation, sqrt(-2 ln R) of the mean resultant length R
+        stats[angle + '_std'] = np.degrees(np.sqrt(-2 * np.log(np.clip(np.hypot(s, c), 1e-12, 1.0))))
+    return stats
+
+
+def store_families(records):
+    """ families the records are tagged with, [] for a store of one untagged family """
+    return [family for family in FAMILIES if (records['family'] == family).any()]
+
+
+def motif_informatics(records, all_chains=ALL_CHAINS, family='ASX'):
+    """
+    motif_informatics -- the statistics of the ASX/ST_informatics notebooks,
+    each computed in one grouped pass over a motif store (motif_store.py).
+
+    PARAMS
+        records
+            motif records, e.g. motif_store.load('ASX_seq.npy')
+        all_chains
+            number of chains searched, for the ratio of chains with a motif
+        family
+            family of the report; of a store tagged with families (e.g.
+            from pipeline.py or search_motifs) only its motifs are counted
+
+    RETURNS
+        a dict of the tables: 'classes', 'secondary_structure',
+        'residue_abundance' and 'dihedrals'
+    """
+    if store_families(records):
+        records = records[records['family'] == family]
+    chains = len(pd.DataFrame({'pdb': records['pdb'], 'chain': records['chain']}).drop_duplicates())
+    print('there are {} nonredundant chains searched, {} have {} motifs, the ratio is {}%.'.format(all_chains, chains, family, chains / all_chains * 100))
+    report = {'classes': class_counts(records), 'secondary_structure': secondary_structure(records, family),
+              'residue_abundance': residue_abundance(records, family), 'dihedrals': dihedral_statistics(records)}
+    surface = int(records['surface'].sum())
+    print('there are {} {} motifs found, {} are at protein surface, the ratio is {}%.'.format(len(records), family, surface, surface / max(len(records), 1) * 100))
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        for name, table in report.items():
+            print()
+            print(name)
+            print(table)
+    return report
+
+
+if __name__== "__main__":
+    parser = argparse.ArgumentParser(description='statistics of ASX/ST motifs from a motif store')
+    parser.add_argument('store', help='motif store (.npy) written by get_seq_sec_dihed or count_hydrophobic_interaction')
+    parser.add_argument('--chains', type=int, default=ALL_CHAINS, help='number of chains searched (default %(default)s)')
+    parser.add_argument('--family', choices=FAMILIES,
+                        help='family to report; default: each family of a store tagged with families, else ASX')
+    args = parser.parse_args()
+    records = motif_store.load(args.store)
+    families = [args.family] if args.family else store_families(records) or ['ASX']
+    for family in families:
+        motif_informatics(records, args.chains, family)
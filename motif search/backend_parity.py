@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+import os
+import sys
+import argparse
+import numpy as np
+import __main__
+from pymol import cmd, stored
+from motif_classes import ASX_DONORS, ST_DONORS
+from motif_search import search_pdb
+from structure import load, phi_psi
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bioinformatics', 'count_hydrophobic_interactions'))
+from hydrophobic_contacts import SideChainCarbons, motif_contacts
+
+
+# In[2]:
+
+
+__main__.pymol_argv = [ 'pymol', '-qc']
+
+
+def _pymol_atoms(selection):
+    """ object index -> (chain, resi, name, alt) """
+    stored.atoms = {}
+    cmd.iterate(selection, 'stored.atoms[index] = (chain, resi, name, alt)')
+    return stored.atoms
+
+
+def _numpy_atoms(structure):
+    return dict(zip(structure.index.tolist(), zip(structure.chain.tolist(), structure.resi.tolist(),
+                                                  structure.name.tolist(), structure.alt.tolist())))
+
+
+def compare_search(PDB_path, pdb_id, chains):
+    """ motif rows of both backends; classes and 'surface' flags must agree, counted separately """
+    report = {'motifs': 0, 'class': 0, 'surface': 0}
+    for donors in (ASX_DONORS, ST_DONORS):
+        rows = {}
+        for backend in ('pymol', 'numpy'):
+            for chain_motifs in search_pdb(PDB_path, pdb_id, chains, donors, 'window', backend):
+                for m in chain_motifs:
+                    rows.setdefault(tuple(m[:3]), {})[backend] = m[3:]
+        for key, found in rows.items():
+            report['motifs'] += 1
+            a, b = found.get('pymol'), found.get('numpy')
+            if a is None or b is None or a[0] != b[0]:
+                report['class'] += 1
+                print('class   ', key, a, b)
+            elif a[1:] != b[1:]:
+                report['surface'] += 1
+                print('surface ', key, a, b)
+    return report
+
+
+def compare_dihedrals(path, chains, tolerance=0.01):
+    """ phi/psi of every residue; same residues, angles within tolerance (degrees) """
+    report = {'residues': 0, 'phi_psi': 0}
+    structure = load(path)
+    cmd.reinitialize()
+    cmd.load(path, 'test')
+    py_atoms = _pymol_atoms('test')
+    np_atoms = _numpy_atoms(structure)
+    for chain_id in chains:
+        a = {py_atoms[i][:2]: v for (o, i), v in cmd.phi_psi('test & c. ' + chain_id).items()}
+        b = {np_atoms[i][:2]: v for (o, i), v in phi_psi(structure, chain_id, -10**6, 10**6).items()}
+        report['residues'] += len(set(a) | set(b))
+        for key in set(a) | set(b):
+            if key not in a or key not in b or max(abs(np.subtract(a[key], b[key]))) > tolerance:
+                report['phi_psi'] += 1
+                print('phi_psi ', chain_id, key, a.get(key), b.get(key))
+    return report
+
+
+def compare_contacts(path, chains):
+    """ N'-N4, N'-N3, N3-N4 side-chain carbon contacts with every residue as motif start """
+    report = {'starts': 0, 'contacts': 0}
+    structure = load(path).remove_hydrogens()
+    cmd.reinitialize()
+    cmd.load(path, 'test')
+    cmd.remove('hydrogen')
+    py_atoms = _pymol_atoms('test')
+    np_atoms = _numpy_atoms(structure)
+    py_carbons = SideChainCarbons('test')
+    np_carbons = SideChainCarbons('test', model=structure.get_model())
+    for chain_id in chains:
+        for start in sorted(set(structure.resv[structure.chain == chain_id].tolist())):
+            report['starts'] += 1
+            inter_a, pocket_a = motif_contacts(py_carbons, chain_id, start)
+            inter_b, pocket_b = motif_contacts(np_carbons, chain_id, start)
+            atoms_a = [[py_atoms[i] for o, i in p] for p in pocket_a]
+            atoms_b = [[np_atoms[i] for o, i in p] for p in pocket_b]
+            if inter_a != inter_b or [sorted(p) for p in atoms_a] != [sorted(p) for p in atoms_b]:
+                report['contacts'] += 1
+                print('contacts', chain_id, start, atoms_a, atoms_b)
+    return report
+
+
+def backend_parity(PDB_path, pdb_ids=None):
+    """
+    backend_parity -- run the PyMOL and the NumPy (structure.py) backends
+    side by side on the .pdb files of PDB_path and report every difference
+    in motif classes, surface flags, phi/psi and hydrophobic contacts.
+    Atom indices are compared through (chain, resi, name, alt), since the
+    NumPy backend numbers atoms in file order.
+
+    RETURNS
+        the summed counts; all but 'motifs', 'residues' and 'starts' are
+        expected to be zero
+    """
+    if pdb_ids is None:
+        pdb_ids = sorted(f[:-4] for f in os.listdir(PDB_path) if f.endswith('.pdb'))
+    total = {}
+    for pdb_id in pdb_ids:
+        path = PDB_path + '/' + pdb_id + '.pdb'
+        # blank chain ids cannot be selected with 'chain <id>' in the search
+        chains = [c for c in load(path).strip().chains() if c != '']
+        for report in (compare_search(PDB_path, pdb_id, chains), compare_dihedrals(path, chains), compare_contacts(path, chains)):
+            for key, value in report.items():
+                total[key] = total.get(key, 0) + value
+    print(total)
+    return total
+
+
+# In[ ]:
+
+
+if __name__== "__main__":
+    parser = argparse.ArgumentParser(description='compare the PyMOL and NumPy structure backends')
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb files')
+    parser.add_argument('pdb_ids', nargs='*', help='PDB ids to check (default: every file in PDB_path)')
+    args = parser.parse_args()
+    total = backend_parity(args.PDB_path, args.pdb_ids or None)
+    sys.exit(1 if any(total[k] for k in ('class', 'surface', 'phi_psi', 'contacts')) else 0)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from motif_classes import DONOR_SPECS, MOTIF_RULES, class_ranks, classify_grid, donor_family
+
+
+# side-chain acceptor slots of a candidate, as many as the donor residue
+# with the most (Asp: OD1, OD2); unused slots have atom '' and nan values
+MAX_ACCEPTORS = max(len(atoms) for family, atoms in DONOR_SPECS.values())
+# H-bonds of a candidate (motif_classes): s2/s3 for every side-chain
+# acceptor slot, m3/m4 for the backbone O of i
+SIDE_CHAIN_BONDS = ('s2', 's3')
+MAIN_CHAIN_BONDS = ('m3', 'm4')
+
+# columns of a candidate table: one row per donor residue of a searched
+# chain that opens a window of five bonded residues, whether it makes a
+# motif or not (near misses have class ''); (dtype, shape of the value of
+# a row). class and acceptor, the side-chain atom whose H-bonds give the
+# class, are those of the search (HBOND_CUTOFF, HBOND_MIN_ANGLE).
+# distances and angles keep the float64 of the search: rounded to float32 a
+# value just past a cutoff can land on it, and the strict tests of
+# motif_classes would then reclassify it differently
+COLUMNS = {'pdb': ('U12', ()), 'chain': ('U4', ()), 'start': ('U8', ()), 'resn': ('U5', ()), 'family': ('U4', ()),
+           'class': ('U4', ()), 'acceptor': ('U4', ()), 'atoms': ('U4', (MAX_ACCEPTORS,))}
+for bond in SIDE_CHAIN_BONDS:
+    COLUMNS[bond + '_distance'] = COLUMNS[bond + '_angle'] = ('f8', (MAX_ACCEPTORS,))
+for bond in MAIN_CHAIN_BONDS:
+    COLUMNS[bond + '_distance'] = COLUMNS[bond + '_angle'] = ('f8', ())
+
+
+def empty(n):
+    """ a table of n rows, names '' and distances/angles nan """
+    table = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        table[name] = np.full((n,) + shape, np.nan if dtype == 'f8' else '', dtype=dtype)
+    return table
+
+
+def chain_table(pdb_id, chain_id, residues, candidates, hbonds, donors):
+    """
+    chain_table -- the candidates of one chain as a table, in chain order.
+
+    PARAMS
+        residues
+            residue table of the chain (motif_search.chain_residues)
+        candidates, hbonds
+            positions and H-bond geometry of the candidates of each residue
+            type (motif_search.chain_candidates, candidate_geometry)
+        donors
+            residue type -> side-chain acceptor atoms
+    """
+    positions = np.concatenate([candidates[resn] for resn in donors] + [np.zeros(0, dtype=int)])
+    order = np.argsort(positions, kind='stable')
+    table = empty(len(positions))
+    table['pdb'][:] = pdb_id
+    table['chain'][:] = chain_id
+    # class names by rank, '' for none
+    names = np.array([name for name, mask in MOTIF_RULES] + [''])
+    row = 0
+    for resn, side_chain_atoms in donors.items():
+        rows = slice(row, row + len(candidates[resn]))
+        table['resn'][rows] = resn
+        table['family'][rows] = donor_family(resn)
+        rank, error, acceptor = class_ranks(hbonds[resn], side_chain_atoms)
+        table['class'][rows] = np.where(error, '', names[rank])
+        table['acceptor'][rows] = np.where(error, '', np.array(list(side_chain_atoms) + [''])[acceptor])
+        for slot, atom in enumerate(side_chain_atoms):
+            table['atoms'][rows, slot] = atom
+            for bond in SIDE_CHAIN_BONDS:
+                table[bond + '_distance'][rows, slot], table[bond + '_angle'][rows, slot] = hbonds[resn][bond + '_' + atom]
+        for bond in MAIN_CHAIN_BONDS:
+            table[bond + '_distance'][rows], table[bond + '_angle'][rows] = hbonds[resn][bond]
+        row += len(candidates[resn])
+    # motif rows name the start residue by number, or by resi with an insertion code
+    table['start'][:] = [str(int(residues['resv'][x])) if residues['icode'][x] == '' else str(residues['resi'][x]) for x in positions]
+    return {name: values[order] for name, values in table.items()}
+
+
+def concatenate(tables):
+    return {name: np.concatenate([table[name] for table in tables] + [empty(0)[name]]) for name in COLUMNS}
+
+
+def as_dict(table):
+    """ a table as JSON-serialisable lists (for the journals) """
+    return {name: table[name].tolist() for name in COLUMNS}
+
+
+def from_dict(value):
+    """ the table of an as_dict value """
+    return {name: np.array(value[name], dtype=COLUMNS[name][0]).reshape((-1,) + COLUMNS[name][1]) for name in COLUMNS}
+
+
+def save(path, table):
+    """ write a table to path (compressed .npz, one array per column) """
+    np.savez_compressed(path, **{name: np.asarray(table[name], dtype=COLUMNS[name][0]) for name in COLUMNS})
+
+
+def load(path):
+    """ the columns of a table written by save; columns a table of an earlier version lacks are left unset """
+    with np.load(path) as data:
+        table = empty(len(data['pdb']))
+        table.update((name, data[name].astype(COLUMNS[name][0])) for name in COLUMNS if name in data)
+        return table
+
+
+def table_hbonds(table, rows, atoms):
+    """ the H-bond arrays of motif_geometry for rows of a table whose side-chain acceptors are atoms """
+    hbonds = {bond: (table[bond + '_distance'][rows], table[bond + '_angle'][rows]) for bond in MAIN_CHAIN_BONDS}
+    for slot, atom in enumerate(atoms):
+        for bond in SIDE_CHAIN_BONDS:
+            hbonds[bond + '_' + atom] = (table[bond + '_distance'][rows, slot], table[bond + '_angle'][rows, slot])
+    return hbonds
+
+
+def classify_table(table, cutoffs, min_angles, rules=MOTIF_RULES, chunk=2048):
+    """
+    classify_table -- class of every candidate of a table under every pair
+    of cutoffs and min_angles, from its stored distances and angles
+    (motif_classes.classify_grid), without any structure. Candidates with
+    the same side-chain acceptors are classified together, chunk rows at a
+    time.
+
+    RETURNS
+        rank in rules of the class, int8 of shape (candidates,
+        len(cutoffs), len(min_angles)); -1 where no class matches
+    """
+    ranks = np.full((len(table['pdb']), len(cutoffs), len(min_angles)), -1, dtype='i1')
+    if len(ranks) == 0:
+        return ranks
+    groups, group = np.unique(table['atoms'], axis=0, return_inverse=True)
+    for k, atoms in enumerate(groups):
+        atoms = [atom for atom in atoms if atom != '']
+        rows = np.nonzero(group.ravel() == k)[0]
+        for first in range(0, len(rows), chunk):
+            part = rows[first:first + chunk]
+            ranks[part] = classify_grid(table_hbonds(table, part, atoms), atoms, cutoffs, min_angles, rules)
+    return ranks
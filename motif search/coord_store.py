@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import time
+import shutil
+import argparse
+import numpy as np
+from structure import Structure
+from structure_source import StructureSource, load_structure
+
+
+# atom columns of a coordinate store: fixed-width byte strings, float32
+# coordinates (the precision PyMOL keeps), and order, the row of each atom
+# in its file (first model), by which the atoms of a structure are put back
+ATOM_FIELDS = {'het': np.dtype(bool), 'name': np.dtype('S4'), 'alt': np.dtype('S1'), 'resn': np.dtype('S5'),
+               'chain': np.dtype('S4'), 'resi': np.dtype('S8'), 'resv': np.dtype('<i4'), 'icode': np.dtype('S3'),
+               'segi': np.dtype('S4'), 'element': np.dtype('S2'), 'coord': np.dtype(('<f4', 3)), 'order': np.dtype('<i4')}
+# one row per chain: its atoms are rows first to end (exclusive) of the atom columns
+CHAIN_INDEX = np.dtype([('pdb', 'U12'), ('chain', 'U4'), ('first', '<i8'), ('end', '<i8')])
+
+
+class CoordinateStore:
+    """
+    CoordinateStore -- the atoms of a set of PDB files, parsed once by
+    compile_store, as memory-mapped NumPy columns (ATOM_FIELDS) with the
+    atoms of each chain in one contiguous block and an offset index
+    (index.npy, CHAIN_INDEX).
+
+    Opening a store reads only the index; chain() gives read-only views of
+    the mapped columns, so any chain is at hand without parsing or copying,
+    and the pages of the chains in use are all that is read from disk.
+    structure() turns the chains of one PDB into a structure.Structure for
+    the NumPy backend of the search, dihedral and hydrophobic stages.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index = np.load(os.path.join(folder, 'index.npy'))
+        self.atoms = {f: np.load(os.path.join(folder, f + '.npy'), mmap_mode='r') for f in ATOM_FIELDS}
+        # pdb id -> chain id -> row of the index
+        self.rows = {}
+        for row, (pdb_id, chain_id) in enumerate(zip(self.index['pdb'].tolist(), self.index['chain'].tolist())):
+            self.rows.setdefault(pdb_id, {})[chain_id] = row
+
+    def __contains__(self, pdb_id):
+        return pdb_id in self.rows
+
+    def chains(self, pdb_id):
+        """ chain ids of pdb_id in the store """
+        return list(self.rows.get(pdb_id, {}))
+
+    def chain(self, pdb_id, chain_id):
+        """ the atom columns of one chain, as views of the memory-mapped files """
+        row = self.index[self.rows[pdb_id][chain_id]]
+        return {f: column[row['first']:row['end']] for f, column in self.atoms.items()}
+
+    def structure(self, pdb_id, chains=None):
+        """
+        structure.Structure of pdb_id as structure.load reads its file: the
+        first model in file order, numbered from 1; with chains (chain ids)
+        only the atoms of those chains, with their index in the file. Only the atoms taken are copied
+        out of the store. None if pdb_id is not in the store
+        """
+        if pdb_id not in self.rows:
+            return None
+        index = self.index[[row for chain_id, row in self.rows[pdb_id].items() if chains is None or chain_id in chains]]
+        rows = np.concatenate([np.arange(first, end) for first, end in zip(index['first'], index['end'])] + [np.zeros(0, dtype=int)])
+        rows = rows[np.argsort(self.atoms['order'][rows], kind='stable')]
+        fields = {}
+        for f, column in self.atoms.items():
+            values = column[rows]
+            fields[f] = values.astype(str) if values.dtype.kind == 'S' else values
+        fields['resv'] = fields['resv'].astype(int)
+        fields['coord'] = fields['coord'].astype(float)
+        fields['index'] = fields.pop('order').astype(int) + 1
+        return Structure(**fields)
+
+
+# one CoordinateStore per process, opened on first use
+_stores = {}
+
+
+def open_store(folder):
+    """ the CoordinateStore in folder, opened once per process """
+    if folder not in _stores:
+        _stores[folder] = CoordinateStore(folder)
+    return _stores[folder]
+
+
+def _column(structure, f, rows):
+    if f == 'order':
+        return (structure.index[rows] - 1).astype(ATOM_FIELDS[f])
+    values = getattr(structure, f)[rows]
+    dtype = ATOM_FIELDS[f]
+    if dtype.kind == 'S':
+        if len(values) and np.char.str_len(values).max() > dtype.itemsize:
+            raise ValueError('{} longer than {} characters: {}'.format(f, dtype.itemsize, values[np.char.str_len(values) > dtype.itemsize][0]))
+    return values.astype(dtype.base)
+
+
+def _write_npy(path, raw, dtype, count):
+    """ raw: file of count items of dtype, written out as the .npy file path """
+    with open(path, 'wb') as out:
+        np.lib.format.write_array_header_1_0(out, {'descr': np.lib.format.dtype_to_descr(dtype.base),
+                                                   'fortran_order': False, 'shape': (count,) + dtype.shape})
+        with open(raw, 'rb') as f:
+            shutil.copyfileobj(f, out, 1 << 24)
+    os.remove(raw)
+
+
+def compile_store(PDB_path, pdb_ids, folder, prefetch=4):
+    """
+    compile_store -- parse the structure files of pdb_ids in PDB_path (flat
+    or a divided mirror, see structure_source.py) once, and write every
+    chain of them (the search needs the other chains for the surface flag)
+    to the coordinate store folder. Columns are appended as the files are
+    read, so a store of the whole nonredundant set never has to fit in
+    memory. Files that are missing are left out (with a note), as load_pdb
+    skips them.
+
+    RETURNS
+        the CoordinateStore
+    """
+    time_start = time.time()
+    os.makedirs(folder, exist_ok=True)
+    raw = {f: open(os.path.join(folder, f + '.npy.tmp'), 'wb') for f in ATOM_FIELDS}
+    index = []
+    count = 0
+    for pdb_id, structure_file in StructureSource(PDB_path, prefetch).prefetch(pdb_ids):
+        if structure_file is None:
+            print(PDB_path + '/' + pdb_id + ' not found')
+            continue
+        structure = load_structure(structure_file)
+        # the atoms of each chain together, in file order within the chain
+        rows = np.argsort(structure.chain, kind='stable')
+        for f in ATOM_FIELDS:
+            raw[f].write(_column(structure, f, rows).tobytes())
+        chain_ids, first, size = np.unique(structure.chain[rows], return_index=True, return_counts=True)
+        index.extend((pdb_id, chain_id, count + a, count + a + n) for chain_id, a, n in zip(chain_ids.tolist(), first, size))
+        count += len(structure)
+        print(pdb_id, len(chain_ids), 'chain(s)', len(structure), 'atoms')
+    for f in ATOM_FIELDS:
+        raw[f].close()
+        _write_npy(os.path.join(folder, f + '.npy'), os.path.join(folder, f + '.npy.tmp'), ATOM_FIELDS[f], count)
+    np.save(os.path.join(folder, 'index.npy'), np.array(index, dtype=CHAIN_INDEX))
+    _stores.pop(folder, None)
+    print('{} chains, {} atoms in {:.1f} s'.format(len(index), count, time.time() - time_start))
+    return open_store(folder)
+
+
+if __name__== "__main__":
+    from motif_search import chain_rows
+    parser = argparse.ArgumentParser(description='compile the PDB files of a chain list into a memory-mapped coordinate store')
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb, .cif or .bcif files (optionally .gz), or a divided mirror (xy/pdb1xyz.ent.gz)')
+    parser.add_argument('PDB_csv', help='csv of PDB ids, e.g. nonredundant_PDBID.csv')
+    parser.add_argument('chain_csv', help='csv of chain ids, e.g. nonredundant_CHAINID.csv')
+    parser.add_argument('start', help='first row of the csv files to compile')
+    parser.add_argument('end', help='last row of the csv files to compile')
+    parser.add_argument('store', help='output folder of the store')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read ahead in background threads (default 4, 0 for none)')
+    args = parser.parse_args()
+    pdb, chain, groups = chain_rows(args.PDB_csv, args.chain_csv, args.start, args.end)
+    compile_store(args.PDB_path, list(groups), args.store, args.prefetch)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+import time
+import datetime
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+import __main__
+from pymol import cmd
+from motif_classes import FAMILIES, HBOND_CUTOFF, HBOND_MIN_ANGLE, MOTIF_RULES, family_donors
+from motif_search import candidate_geometry, chain_candidates, chain_geometry, chain_rows, load_pdb, protonate
+from structure_source import StructureSource
+import candidate_table
+
+
+# In[2]:
+
+
+__main__.pymol_argv = [ 'pymol', '-qc']
+
+
+def parse_grid(text):
+    """ cutoff values from 'first:last:count' (evenly spaced, ends included) or 'a,b,c' """
+    if ':' in text:
+        first, last, count = text.split(':')
+        return np.round(np.linspace(float(first), float(last), int(count)), 6)
+    return np.array([float(v) for v in text.split(',')])
+
+
+def sweep_pdb(PDB_path, pdb_id, chain_ids, donors, backend='pymol', hydrogens='place', store=None, structure_file=None):
+    """
+    sweep_pdb -- H-bond distances and angles of every candidate of the
+    chains chain_ids of one structure, loaded and protonated as search_pdb
+    does, without classifying them.
+
+    RETURNS
+        a candidate table (candidate_table.py) for each chain id in
+        chain_ids, in that order
+    """
+    time_start = time.time()
+    chain_ids = [c.replace(' ','') for c in chain_ids]
+    loaded = load_pdb(PDB_path, pdb_id, chain_ids, backend, structure_file, store)
+    if loaded is None:
+        return [candidate_table.empty(0) for c in chain_ids]
+    structure, chains, models, residues = loaded
+    structure = protonate(structure, residues, hydrogens)
+    tables = []
+    for chain_id in chain_ids:
+        if residues[chain_id] is None or len(residues[chain_id]) < 8:
+            tables.append(candidate_table.empty(0))
+            continue
+        geometry = chain_geometry(pdb_id, chain_id, models[chain_id], structure, hydrogens)
+        candidates = chain_candidates(residues[chain_id], donors)
+        hbonds = candidate_geometry(geometry, residues[chain_id], candidates, donors)
+        tables.append(candidate_table.chain_table(pdb_id, chain_id, residues[chain_id], candidates, hbonds, donors))
+    cmd.select('all')
+    cmd.delete('all')
+    print('{} {} chain(s) {:.2f} s'.format(pdb_id, len(chain_ids), time.time() - time_start))
+    return tables
+
+
+def _sweep_pdb(work):
+    return sweep_pdb(*work)
+
+
+def sweep_table(table, cutoffs, min_angles, output, rules=MOTIF_RULES):
+    """
+    sweep_table -- reclassify the candidates of a table under every pair of
+    cutoffs (A) and min_angles (degrees) in one vectorised pass
+    (candidate_table.classify_table), and write
+
+        output_labels.npy   int8 (candidates, len(cutoffs), len(min_angles)):
+                            rank in rules of the class of each candidate, in
+                            the row order of the table, -1 for none
+        output_counts.csv   number of motifs of each class (and of
+                            candidates with none) per family and grid point
+
+    RETURNS
+        the counts as a DataFrame
+    """
+    ranks = candidate_table.classify_table(table, cutoffs, min_angles, rules)
+    np.save(output + '_labels.npy', ranks)
+    names = [name for name, mask in rules]
+    counts = []
+    for family in sorted(set(table['family'].tolist())):
+        family_ranks = ranks[table['family'] == family]
+        for a, cutoff in enumerate(cutoffs):
+            for b, min_angle in enumerate(min_angles):
+                n = np.bincount(family_ranks[:, a, b].astype(int) + 1, minlength=len(rules) + 1)
+                counts.append([family, cutoff, min_angle] + n[1:].tolist() + [n[0]])
+    counts = pd.DataFrame(counts, columns=['family', 'cutoff', 'min_angle'] + names + ['none'])
+    counts.to_csv(output + '_counts.csv', index=False)
+    return counts
+
+
+def run_sweep(PDB_path, PDB_csv, chain_csv, start, end, output, families=('ASX', 'ST'), cutoffs=(HBOND_CUTOFF,), min_angles=(HBOND_MIN_ANGLE,),
+              workers=1, backend='pymol', hydrogens='place', prefetch=4, store=None):
+    """
+    run_sweep -- sensitivity of the motif classes to the H-bond cutoffs: one
+    geometry pass over the chains in rows start to end of PDB_csv /
+    chain_csv keeps the raw distances and angles of every ASX and/or ST
+    candidate in output.candidates.npz, which sweep_table then reclassifies
+    under the whole grid of cutoffs x min_angles, instead of one full
+    search per grid point. The 'surface' flag is not computed.
+
+    workers, backend, hydrogens, prefetch and store as in read_PDB.
+    """
+    time_stamp = datetime.datetime.now()
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    if store is not None:
+        backend = 'numpy'
+    pdb, chain, groups = chain_rows(PDB_csv, chain_csv, start, end)
+    donors = family_donors(families)
+    work = [(PDB_path, pdb_id, [str(chain[i]) for i in rows], donors, backend, hydrogens, store) for pdb_id, rows in groups.items()]
+    if int(workers) > 1:
+        pool = multiprocessing.get_context('spawn').Pool(int(workers))
+        results = pool.imap(_sweep_pdb, work, chunksize=1)
+    elif store is not None:
+        pool = None
+        results = map(_sweep_pdb, work)
+    else:
+        pool = None
+        files = StructureSource(PDB_path, prefetch).prefetch(groups)
+        results = (_sweep_pdb(w + (f,)) for w, (pdb_id, f) in zip(work, files))
+    row_tables = {}
+    for rows, tables in zip(groups.values(), results):
+        row_tables.update(zip(rows, tables))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    table = candidate_table.concatenate([row_tables[i] for i in sorted(row_tables)])
+    candidate_table.save(output + '.candidates.npz', table)
+    counts = sweep_table(table, cutoffs, min_angles, output)
+    time_stamp = datetime.datetime.now()
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    return counts
+
+
+# In[ ]:
+
+
+if __name__== "__main__":
+    parser = argparse.ArgumentParser(description='ASX/ST motif classes over a grid of H-bond distance and angle cutoffs, from one geometry pass')
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb, .cif or .bcif files (optionally .gz), or a divided mirror (xy/pdb1xyz.ent.gz)')
+    parser.add_argument('PDB_csv', help='csv of PDB ids, e.g. nonredundant_PDBID.csv')
+    parser.add_argument('chain_csv', help='csv of chain ids, e.g. nonredundant_CHAINID.csv')
+    parser.add_argument('start', help='first row of the csv files to search')
+    parser.add_argument('end', help='last row of the csv files to search')
+    parser.add_argument('output', help='output name: <output>.candidates.npz, <output>_labels.npy and <output>_counts.csv')
+    parser.add_argument('--families', nargs='+', choices=FAMILIES, default=FAMILIES, help='motif families to search (default: %(default)s)')
+    parser.add_argument('--cutoffs', type=parse_grid, default=parse_grid('3.0:4.0:21'),
+                        help="acceptor...N distance cutoffs in A, 'first:last:count' or 'a,b,c' (default 3.0:4.0:21)")
+    parser.add_argument('--min-angles', type=parse_grid, default=parse_grid('120:160:21'),
+                        help="smallest acceptor...H-N angles in degrees, 'first:last:count' or 'a,b,c' (default 120:160:21)")
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--backend', choices=['pymol', 'numpy'], default='pymol',
+                        help='structure handling with PyMOL (default) or the PyMOL-free NumPy loader')
+    parser.add_argument('--hydrogens', choices=['place', 'h_add', 'check'], default='place',
+                        help='backbone N-H placed from geometry (default), from cmd.h_add, or both compared (PyMOL backend)')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read and decompressed ahead in background threads by a serial run (default 4, 0 for none)')
+    parser.add_argument('--store', help='coordinate store compiled from PDB_path by coord_store.py, read with the NumPy backend instead of the files')
+    args = parser.parse_args()
+    run_sweep(args.PDB_path, args.PDB_csv, args.chain_csv, args.start, args.end, args.output, tuple(args.families), args.cutoffs, args.min_angles,
+              args.workers, args.backend, args.hydrogens, args.prefetch, args.store)
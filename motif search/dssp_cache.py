@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import io
+import os
+import re
+import gzip
+import hashlib
+import tempfile
+import threading
+import subprocess
+import numpy as np
+from Bio.PDB import PDBParser, MMCIFParser
+from Bio.PDB.DSSP import DSSP
+from structure import is_bcif, is_mmcif, load, write_mmcif
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'asx-st-search', 'dssp')
+
+
+class DSSPCache:
+    """
+    DSSPCache -- per-residue DSSP assignments of PDB files kept on disk.
+
+    Entries are keyed by the SHA-256 of the PDB file together with the DSSP
+    version, so an unchanged file is never run through mkdssp twice, whichever
+    stage (ASX or ST) asks for it. Each entry is one small .npz file of
+    columns (chain, hetero flag, resseq, icode, code). When the cache grows
+    over max_bytes the least recently used entries are removed.
+
+    The cache switches itself off when the DSSP version cannot be determined
+    (e.g. mkdssp is not installed), so failures are never stored.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=2 * 1024**3, dssp='mkdssp'):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.dssp = dssp
+        self.version = dssp_version(dssp)
+        self.entries = {}
+        if self.version is None:
+            return
+        os.makedirs(cache_dir, exist_ok=True)
+        for root, dirs, files in os.walk(cache_dir):
+            for f in files:
+                if f.endswith('.npz') and '.tmp.' not in f:
+                    path = os.path.join(root, f)
+                    self.entries[path] = os.path.getsize(path)
+        self.size = sum(self.entries.values())
+
+    def path(self, pdb_path):
+        sha = hashlib.sha256()
+        with open(pdb_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        sha.update(b'\0' + self.version.encode())
+        key = sha.hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + '.npz')
+
+    def get(self, pdb_path):
+        """ cached table of pdb_path as returned by run_dssp, None on a miss """
+        if self.version is None:
+            return None
+        path = self.path(pdb_path)
+        if path not in self.entries:
+            return None
+        try:
+            data = np.load(path)
+            table = {}
+            for chain, het, resseq, icode, code in zip(data['chain'], data['het'], data['resseq'], data['icode'], data['code']):
+                table[(str(chain), (str(het), int(resseq), str(icode)))] = str(code)
+        except (OSError, ValueError, KeyError):
+            return None
+        # mark as recently used
+        os.utime(path)
+        return table
+
+    def put(self, pdb_path, table):
+        if self.version is None:
+            return
+        path = self.path(pdb_path)
+        keys = list(table.keys())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp.npz'
+        np.savez_compressed(tmp,
+                            chain=np.array([k[0] for k in keys], dtype='U8'),
+                            het=np.array([k[1][0] for k in keys], dtype='U8'),
+                            resseq=np.array([k[1][1] for k in keys], dtype=np.int32),
+                            icode=np.array([k[1][2] for k in keys], dtype='U1'),
+                            code=np.array([table[k] for k in keys], dtype='U1'))
+        os.replace(tmp, path)
+        self.size += os.path.getsize(path) - self.entries.get(path, 0)
+        self.entries[path] = os.path.getsize(path)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """ remove least recently used entries until the cache is below max_bytes """
+        lru = []
+        for path in self.entries:
+            try:
+                lru.append((os.path.getmtime(path), path))
+            except OSError:
+                lru.append((0, path))
+        lru.sort()
+        for mtime, path in lru:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= self.entries.pop(path)
+
+
+def dssp_version(dssp='mkdssp'):
+    """ first line of 'mkdssp --version', None if it cannot be run """
+    try:
+        out = subprocess.run([dssp, '--version'], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    lines = out.stdout.decode(errors='replace').strip().splitlines()
+    return lines[0].strip() if lines else None
+
+
+def dssp_input(pdb_path, data=None):
+    """
+    (file name, content) mkdssp and Bio.PDB read for pdb_path: the file
+    decompressed, as structure.pdb or structure.cif, or an mmCIF of a
+    BinaryCIF file. data: the decompressed content, if already read
+    (structure_source.StructureFile.data)
+    """
+    if is_bcif(pdb_path):
+        text = io.StringIO()
+        write_mmcif(load(pdb_path, data=data), text)
+        return 'structure.cif', text.getvalue().encode()
+    if data is None:
+        with (gzip.open(pdb_path, 'rb') if pdb_path.endswith('.gz') else open(pdb_path, 'rb')) as f:
+            data = f.read()
+    return ('structure.cif' if is_mmcif(pdb_path) else 'structure.pdb'), data
+
+
+def _feed(fifo, content, done):
+    """ write content to the first reader that opens fifo, unless done is set first """
+    with open(fifo, 'wb', buffering=0) as f:
+        if done.is_set():
+            return
+        try:
+            f.write(content)
+        except BrokenPipeError:
+            pass
+
+
+def _reads_input(name, version):
+    """ whether Bio.PDB.DSSP reads the input file too: mmCIF with DSSP before 4.0, for its chain ids """
+    number = re.search(r'\s*([\d.]+)', version or '')
+    return name.endswith('.cif') and number is not None and [int(v) for v in number.group(1).split('.') if v] < [4]
+
+
+def run_dssp(pdb_path, cache=None, dssp='mkdssp', data=None):
+    """
+    secondary structure of every residue in pdb_path (PDB, mmCIF or
+    BinaryCIF, gzipped or not) from a single mkdssp run, keyed like
+    Bio.PDB.DSSP: (chain, (' ', resseq, icode)) -> DSSP code.
+    Empty if DSSP fails on the file. With a DSSPCache, unchanged files are
+    answered from disk without running mkdssp.
+
+    mkdssp reads the decompressed file (data, or dssp_input) from a named
+    pipe, so no copy of it is written to disk; Bio.PDB parses it from
+    memory. Only where the pipe cannot be used, without os.mkfifo or when
+    Bio.PDB.DSSP reads the file a second time (mmCIF with DSSP before 4.0),
+    it is written to a temporary file.
+    """
+    if cache is not None:
+        dssp = cache.dssp
+        table = cache.get(pdb_path)
+        if table is not None:
+            return table
+    try:
+        name, content = dssp_input(pdb_path, data)
+        p = MMCIFParser(QUIET=True) if name.endswith('.cif') else PDBParser()
+        model = p.get_structure("try", io.StringIO(content.decode('latin-1')))[0]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, name)
+            if not hasattr(os, 'mkfifo') or _reads_input(name, cache.version if cache is not None else dssp_version(dssp)):
+                with open(path, 'wb') as f:
+                    f.write(content)
+                result = DSSP(model, path, dssp=dssp)
+            else:
+                os.mkfifo(path)
+                done = threading.Event()
+                feeder = threading.Thread(target=_feed, args=(path, content, done), daemon=True)
+                feeder.start()
+                try:
+                    result = DSSP(model, path, dssp=dssp)
+                finally:
+                    done.set()
+                    # a reader of our own lets the feeder's open return if mkdssp never opened the pipe
+                    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                    feeder.join()
+                    os.close(fd)
+    except:
+        return {}
+    table = {key: result[key][2] for key in result.keys()}
+    if cache is not None:
+        cache.put(pdb_path, table)
+    return table
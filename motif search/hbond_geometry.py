@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from pymol import cmd
+from structure import PEPTIDE_BOND, amide_hydrogen_positions, crowded_amides, model_structure
+
+
+class ChainGeometry:
+    """
+    ChainGeometry -- coordinates of one chain pulled out of PyMOL once and
+    indexed by (resi, atom name).
+
+    Replaces the per-residue cmd.distance / cmd.get_angle calls of read_PDB:
+    every selection string that used to be parsed by PyMOL becomes a dict
+    lookup, and distances and D-H...A angles are computed for all candidates
+    in one NumPy pass.
+
+    An atom lookup that matches no atom or more than one atom (alternate
+    locations) gives -1, which is where cmd.get_angle used to raise and send
+    the residue to the 'error' branch.
+
+    With place_amide_h the chain does not need to be protonated: the
+    backbone amide hydrogens are placed from the C(i-1), N and CA positions
+    instead of being taken from cmd.h_add.
+    """
+
+    def __init__(self, selection, state=1, model=None, place_amide_h=False):
+        # model: the atoms, when they do not come from PyMOL (Structure.get_model)
+        if model is None:
+            model = cmd.get_model(selection, state=state)
+        self.resi = [at.resi for at in model.atom]
+        self.resn = [at.resn for at in model.atom]
+        self.name = [at.name for at in model.atom]
+        self.coord = np.array([at.coord for at in model.atom], dtype=float).reshape(-1, 3)
+        self.index = {}
+        for n, at in enumerate(model.atom):
+            self.index.setdefault((at.resi, at.name), []).append(n)
+        # 'h. within 2 of n. N' -- hydrogens of a residue within 2 A of its N
+        self.amide_h = {}
+        hydrogens = {}
+        for n, at in enumerate(model.atom):
+            if at.symbol in ('H', 'D'):
+                hydrogens.setdefault(at.resi, []).append(n)
+        for resi, h_list in hydrogens.items():
+            n_list = self.index.get((resi, 'N'), [])
+            if len(n_list) == 0:
+                continue
+            h_list = np.array(h_list)
+            d = np.linalg.norm(self.coord[h_list][:, None, :] - self.coord[n_list][None, :, :], axis=2)
+            self.amide_h[resi] = list(h_list[(d <= 2.0).any(axis=1)])
+        if place_amide_h:
+            self.place_amide_hydrogens(model)
+
+    def place_amide_hydrogens(self, model):
+        """
+        add an N-H to every residue whose N has no hydrogen yet and is
+        peptide-bonded to the C of the residue before it (prolines excluded),
+        as cmd.h_add would; all of them in one NumPy operation.
+
+        Residues where h_add would also put an alpha or side-chain hydrogen
+        within 2 A of N get none, as 'h. within 2 of n. N' is ambiguous there
+        (crowded_amides on the atoms of model).
+        """
+        structure = model_structure(model)
+        res = structure.residue_ids()
+        first_rows = np.nonzero(np.r_[True, res[1:] != res[:-1]])[0] if len(res) else res
+        crowded = set(structure.resi[first_rows[crowded_amides(structure)]].tolist())
+        residues = list(dict.fromkeys(self.resi))
+        first = dict(zip(reversed(self.resi), reversed(range(len(self.resi)))))
+        rows = []
+        for prev, resi in zip(residues[:-1], residues[1:]):
+            n = self.index.get((resi, 'N'), [])
+            ca = self.index.get((resi, 'CA'), [])
+            c = self.index.get((resi, 'C'), [])
+            c_prev = self.index.get((prev, 'C'), [])
+            if self.amide_h.get(resi) or self.resn[first[resi]] == 'PRO' or resi in crowded or not (n and ca and c and c_prev):
+                continue
+            rows.append((resi, n[0], ca[0], c_prev[0]))
+        if len(rows) == 0:
+            return
+        n, ca, c_prev = (np.array([r[k] for r in rows]) for k in (1, 2, 3))
+        ok = np.linalg.norm(self.coord[n] - self.coord[c_prev], axis=1) < PEPTIDE_BOND
+        h_xyz = amide_hydrogen_positions(self.coord[n[ok]], self.coord[ca[ok]], self.coord[c_prev[ok]])
+        placed = [row[0] for row, b in zip(rows, ok) if b]
+        for k, resi in enumerate(placed):
+            self.amide_h[resi] = [len(self.coord) + k]
+        self.coord = np.concatenate([self.coord, h_xyz])
+
+    def atom_indices(self, resi, name):
+        """ atom index for every residue id in resi, -1 if missing or ambiguous """
+        out = np.full(len(resi), -1, dtype=int)
+        for n, r in enumerate(resi):
+            found = self.index.get((str(r), name), [])
+            if len(found) == 1:
+                out[n] = found[0]
+        return out
+
+    def amide_h_indices(self, resi):
+        """ index of the backbone amide hydrogen for every residue id in resi """
+        out = np.full(len(resi), -1, dtype=int)
+        for n, r in enumerate(resi):
+            found = self.amide_h.get(str(r), [])
+            if len(found) == 1:
+                out[n] = found[0]
+        return out
+
+    def hbond(self, acceptor, nitrogen, hydrogen):
+        """
+        distance acceptor...N and angle acceptor...H-N (at H, degrees) for
+        arrays of atom indices; nan wherever one of the atoms is missing
+        """
+        ok = (acceptor >= 0) & (nitrogen >= 0) & (hydrogen >= 0)
+        a = self.coord[np.where(ok, acceptor, 0)]
+        n = self.coord[np.where(ok, nitrogen, 0)]
+        h = self.coord[np.where(ok, hydrogen, 0)]
+        distance = np.linalg.norm(a - n, axis=1)
+        ha, hn = a - h, n - h
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cos = np.sum(ha * hn, axis=1) / (np.linalg.norm(ha, axis=1) * np.linalg.norm(hn, axis=1))
+        angle = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+        distance[~ok] = np.nan
+        angle[~ok] = np.nan
+        return distance, angle
+
+
+def motif_geometry(geometry, windows, side_chain_atoms):
+    """
+    motif_geometry -- all H-bond distances and angles of the ASX/ST rules for
+    every candidate, in one batched pass.
+
+    PARAMS
+        windows
+            one row per candidate: the resi of its residues i to i+4, in
+            sequence order (residue ids, so insertion codes are fine)
+
+    RETURNS
+        a dict of (distance, angle) array pairs:
+            's2_<atom>', 's3_<atom>'  side-chain <atom> of i to N-H of i+2 / i+3
+            'm3', 'm4'                backbone O of i to N-H of i+3 / i+4
+    """
+    windows = np.asarray(windows, dtype=str).reshape(-1, 5)
+    nitrogen = {j: geometry.atom_indices(windows[:, j], 'N') for j in (2, 3, 4)}
+    hydrogen = {j: geometry.amide_h_indices(windows[:, j]) for j in (2, 3, 4)}
+    values = {}
+    for atom in side_chain_atoms:
+        acceptor = geometry.atom_indices(windows[:, 0], atom)
+        values['s2_' + atom] = geometry.hbond(acceptor, nitrogen[2], hydrogen[2])
+        values['s3_' + atom] = geometry.hbond(acceptor, nitrogen[3], hydrogen[3])
+    oxygen = geometry.atom_indices(windows[:, 0], 'O')
+    values['m3'] = geometry.hbond(oxygen, nitrogen[3], hydrogen[3])
+    values['m4'] = geometry.hbond(oxygen, nitrogen[4], hydrogen[4])
+    return values
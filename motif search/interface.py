@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from pymol import cmd, stored
+from scipy.spatial import cKDTree
+from structure import split_resi
+
+
+def interfaceResidues(cmpx, cA='c. A', cB='c. B', cutoff=1.0, selName="interface"):
+        """
+        interfaceResidues -- finds 'interface' residues between two chains in a complex.
+
+        PARAMS
+            cmpx
+                The complex containing cA and cB
+
+            cA
+                The first chain in which we search for residues at an interface
+                with cB
+
+            cB
+                The second chain in which we search for residues at an interface
+                with cA
+
+            cutoff
+                The difference in area OVER which residues are considered
+                interface residues.  Residues whose dASA from the complex to
+                a single chain is greater than this cutoff are kept.  Zero
+                keeps all residues.
+
+            selName
+                The name of the selection to return.
+
+        RETURNS
+            * A selection of interface residues is created and named
+                depending on what you passed into selName
+            * An array of values is returned where each value is:
+                ( modelName, residueNumber, dASA )
+
+        NOTES
+            If you have two chains that are not from the same PDB that you want
+            to complex together, use the create command like:
+                create myComplex, pdb1WithChainA or pdb2withChainX
+            then pass myComplex to this script like:
+                interfaceResidues myComlpex, c. A, c. X
+
+            This script calculates the area of the complex as a whole.  Then,
+            it separates the two chains that you pass in through the arguments
+            cA and cB, alone.  Once it has this, it calculates the difference
+            and any residues ABOVE the cutoff are called interface residues.
+
+        AUTHOR:
+            Jason Vertrees, 2009.		
+        """
+        # Save user's settings, before setting dot_solvent
+        oldDS = cmd.get("dot_solvent")
+        cmd.set("dot_solvent", 1)
+
+        # set some string names for temporary objects/selections
+        tempC, selName1 = "tempComplex", selName+"1"
+        chA, chB = "chA", "chB"
+
+        # operate on a new object & turn off the original
+        cmd.create(tempC, cmpx)
+        cmd.disable(cmpx)
+
+        # remove cruft and inrrelevant chains
+        cmd.remove(tempC + " and not (polymer and (%s or %s))" % (cA, cB))
+
+        # get the area of the complete complex
+        cmd.get_area(tempC, load_b=1)
+        # copy the areas from the loaded b to the q, field.
+        cmd.alter(tempC, 'q=b')
+
+        # extract the two chains and calc. the new area
+        # note: the q fields are copied to the new objects
+        # chA and chB
+        cmd.extract(chA, tempC + " and (" + cA + ")")
+        cmd.extract(chB, tempC + " and (" + cB + ")")
+        cmd.get_area(chA, load_b=1)
+        cmd.get_area(chB, load_b=1)
+
+        # update the chain-only objects w/the difference
+        cmd.alter( "%s or %s" % (chA,chB), "b=b-q" )
+
+        # The calculations are done.  Now, all we need to
+        # do is to determine which residues are over the cutoff
+        # and save them.
+        stored.r, rVal, seen = [], [], []
+        cmd.iterate('%s or %s' % (chA, chB), 'stored.r.append((model,resi,b))')
+
+        cmd.enable(cmpx)
+        cmd.select(selName1, 'none')
+        for (model,resi,diff) in stored.r:
+            key=resi+"-"+model
+            if abs(diff)>=float(cutoff):
+                if key in seen: continue
+                else: seen.append(key)
+                rVal.append( (model,resi,diff) )
+                # expand the selection here; I chose to iterate over stored.r instead of
+                # creating one large selection b/c if there are too many residues PyMOL
+                # might crash on a very large selection.  This is pretty much guaranteed
+                # not to kill PyMOL; but, it might take a little longer to run.
+                cmd.select( selName1, selName1 + " or (%s and i. %s)" % (model,resi))
+
+        # this is how you transfer a selection to another object.
+        cmd.select(selName, cmpx + " in " + selName1)
+        # clean up after ourselves
+        cmd.delete(selName1)
+        cmd.delete(chA)
+        cmd.delete(chB)
+        cmd.delete(tempC)
+        # show the selection
+        cmd.enable(selName)
+
+        # reset users settings
+        cmd.set("dot_solvent", oldDS)
+        return rVal
+
+
+def resi_selection(resi):
+    """ 'i. 51+52+52A+\\-3' for a list of residue ids (minus signs escaped for the selection language) """
+    return "i. " + "+".join(r.replace('-', '\\-') for r in resi)
+
+
+def pairwise_interface_residues(cmpx, chain_id, chains, cutoff=1.0):
+    """
+    pairwise_interface_residues -- residue ids of chain_id found at an
+    interface with any other chain by running interfaceResidues on every
+    chain pair. Exhaustive; kept to check the fast engine against.
+    """
+    chain_interface_residues = []
+    for partner in chains:
+        if partner != chain_id:
+            interface = interfaceResidues(cmpx, cA='c. ' + chain_id, cB='c. ' + partner, cutoff=cutoff)
+            for model, resi, diff in interface:
+                if model == 'chA':
+                    chain_interface_residues.append(resi)
+    return sorted(set(chain_interface_residues), key=split_resi)
+
+
+def _atom_areas(selection):
+    """ (resi, name, per-atom SASA) of selection after cmd.get_area(load_b=1) on its object """
+    stored.areas = []
+    cmd.iterate(selection, 'stored.areas.append((resi, name, b))')
+    return stored.areas
+
+
+def chain_interface_residues(cmpx, chain_id, chains, cutoff=1.0):
+    """
+    chain_interface_residues -- residue ids of chain_id whose per-atom
+    SASA changes by cutoff or more when any other chain is added, i.e. the
+    same residues as pairwise_interface_residues.
+
+    The chain-alone SASA is computed once instead of once per pair, only the
+    pair complex is computed per partner, and partners with no atom within
+    reach (largest vdW radius of each chain + 2 x solvent radius) of the chain
+    are skipped with a KD-tree check, since they cannot change its SASA.
+    """
+    oldDS = cmd.get("dot_solvent")
+    cmd.set("dot_solvent", 1)
+    probe = float(cmd.get("solvent_radius"))
+    chain_sel = "%s and polymer and c. %s" % (cmpx, chain_id)
+    cmd.create("ifChain", chain_sel)
+    cmd.get_area("ifChain", load_b=1)
+    alone = _atom_areas("ifChain")
+    coord_a = cmd.get_coords("ifChain")
+    stored.vdw = []
+    cmd.iterate("ifChain", "stored.vdw.append(vdw)")
+    vdw_a = max(stored.vdw) if stored.vdw else 0.0
+    residues = set()
+    if coord_a is not None:
+        tree = cKDTree(coord_a)
+        for partner in chains:
+            if partner == chain_id:
+                continue
+            partner_sel = "%s and polymer and c. %s" % (cmpx, partner)
+            coord_b = cmd.get_coords(partner_sel)
+            if coord_b is None:
+                continue
+            stored.vdw = []
+            cmd.iterate(partner_sel, "stored.vdw.append(vdw)")
+            reach = vdw_a + max(stored.vdw) + 2 * probe
+            # distant chains cannot bury any surface of chain_id
+            lo, hi = coord_a.min(axis=0) - reach, coord_a.max(axis=0) + reach
+            near = coord_b[((coord_b >= lo) & (coord_b <= hi)).all(axis=1)]
+            if len(near) == 0 or not np.isfinite(tree.query(near, k=1, distance_upper_bound=reach)[0]).any():
+                continue
+            cmd.create("ifPair", "%s and polymer and (c. %s or c. %s)" % (cmpx, chain_id, partner))
+            cmd.get_area("ifPair", load_b=1)
+            paired = _atom_areas("ifPair and c. %s" % chain_id)
+            cmd.delete("ifPair")
+            for (resi, name, b_alone), (resi_p, name_p, b_pair) in zip(alone, paired):
+                if abs(b_alone - b_pair) >= float(cutoff):
+                    residues.add(resi)
+    cmd.delete("ifChain")
+    cmd.set("dot_solvent", oldDS)
+    return sorted(residues, key=split_resi)
+
+
+def window_interface_residues(cmpx, chain_id, chains, windows, cutoff=1.0):
+    """
+    window_interface_residues -- like chain_interface_residues, but only for
+    the residues inside windows, a list of residue id lists of chain_id (the
+    detected motifs).
+
+    Only the atoms that can touch a window atom's SASA (within the largest
+    vdW diameter + 2 x solvent radius) are copied into the objects handed to
+    get_area, and partners with no atom near a window are skipped, so the
+    cost follows the number of motifs rather than the size of the complex.
+    """
+    if len(windows) == 0:
+        return []
+    oldDS = cmd.get("dot_solvent")
+    cmd.set("dot_solvent", 1)
+    probe = float(cmd.get("solvent_radius"))
+    stored.vdw = []
+    cmd.iterate("%s and polymer" % cmpx, "stored.vdw.append(vdw)")
+    reach = 2 * max(stored.vdw) + 2 * probe
+    window_resi = resi_selection(dict.fromkeys(resi for window in windows for resi in window))
+    window_sel = "%s and polymer and c. %s and %s" % (cmpx, chain_id, window_resi)
+    coord_w = cmd.get_coords(window_sel)
+    residues = set()
+    if coord_w is not None:
+        tree = cKDTree(coord_w)
+        cmd.create("ifWindow", "(%s and polymer and c. %s) within %f of (%s)" % (cmpx, chain_id, reach, window_sel))
+        cmd.get_area("ifWindow", load_b=1)
+        alone = _atom_areas("ifWindow and c. %s and %s" % (chain_id, window_resi))
+        cmd.delete("ifWindow")
+        for partner in chains:
+            if partner == chain_id:
+                continue
+            partner_sel = "%s and polymer and c. %s" % (cmpx, partner)
+            coord_b = cmd.get_coords(partner_sel)
+            if coord_b is None:
+                continue
+            # partners out of reach of every window cannot bury any of it
+            lo, hi = coord_w.min(axis=0) - reach, coord_w.max(axis=0) + reach
+            near = coord_b[((coord_b >= lo) & (coord_b <= hi)).all(axis=1)]
+            if len(near) == 0 or not np.isfinite(tree.query(near, k=1, distance_upper_bound=reach)[0]).any():
+                continue
+            cmd.create("ifWindowPair", "(%s and polymer and (c. %s or c. %s)) within %f of (%s)" % (cmpx, chain_id, partner, reach, window_sel))
+            cmd.get_area("ifWindowPair", load_b=1)
+            paired = _atom_areas("ifWindowPair and c. %s and %s" % (chain_id, window_resi))
+            cmd.delete("ifWindowPair")
+            for (resi, name, b_alone), (resi_p, name_p, b_pair) in zip(alone, paired):
+                if abs(b_alone - b_pair) >= float(cutoff):
+                    residues.add(resi)
+    cmd.set("dot_solvent", oldDS)
+    return sorted(residues, key=split_resi)
+
+
+def add_window_hydrogens(cmpx, chain_id, windows):
+    """
+    add_window_hydrogens -- cmd.h_add on only the residues whose atoms can
+    enter the SASA of window_interface_residues for these windows, i.e. with
+    an atom within reach (plus two X-H bonds) of a window atom. The areas
+    are then the same as on the fully protonated structure.
+    """
+    probe = float(cmd.get("solvent_radius"))
+    stored.vdw = []
+    cmd.iterate("%s and polymer" % cmpx, "stored.vdw.append(vdw)")
+    # heavy-atom radii bound those of the hydrogens still to be added
+    reach = 2 * max(stored.vdw) + 2 * probe + 2.5
+    window_resi = resi_selection(dict.fromkeys(resi for window in windows for resi in window))
+    window_sel = "%s and polymer and c. %s and %s" % (cmpx, chain_id, window_resi)
+    cmd.h_add("byres ((%s and polymer) within %f of (%s))" % (cmpx, reach, window_sel))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import json
+import numpy as np
+
+
+class Journal:
+    """
+    Journal -- append-only progress file (one JSON object per line) for long
+    runs over the PDB.
+
+    Every finished item is written as {"key": ..., "value": ...} and synced
+    to disk, so a run that is killed loses at most the item in progress.
+    With resume=True the items already in the file are loaded into
+    journal.done and the caller skips them; otherwise the file is started
+    afresh. A partly written last line (killed mid-write) is ignored.
+
+    The final csv of a stage is written once, from the journal, at the end
+    of the run instead of being rewritten every 50 items.
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.done = {}
+        if resume and os.path.isfile(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.done[entry['key']] = entry['value']
+            print('resuming: {} items already done in {}'.format(len(self.done), path))
+            # drop a partly written last line before appending to the file
+            with open(path, 'rb+') as f:
+                data = f.read()
+                f.truncate(data.rfind(b'\n') + 1)
+        self.file = open(path, 'a' if resume else 'w')
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def record(self, entries):
+        """ add finished items, a dict key -> value (JSON-serialisable) """
+        for key, value in entries.items():
+            self.file.write(json.dumps({'key': key, 'value': value}) + '\n')
+            self.done[key] = value
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def csv_cells(row):
+    """ a result row with list cells turned into the strings to_csv would write """
+    cells = []
+    for cell in row:
+        if isinstance(cell, (list, tuple, dict)):
+            cell = str(cell)
+        elif isinstance(cell, np.generic):
+            cell = cell.item()
+        cells.append(cell)
+    return cells
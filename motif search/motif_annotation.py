@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+from motif_store import WINDOW, encode_sequence
+
+
+# residues around the motif start i whose sequence and DSSP codes are
+# reported, as [first, last + 1) offsets from i
+ASX_WINDOWS = {'sequence': (-2, 6), 'secondary': (-1, 5)}
+ST_WINDOWS = {'sequence': (-1, 5), 'secondary': (0, 4)}
+# per motif family; families without an entry get the ASX windows
+FAMILY_WINDOWS = {'ASX': ASX_WINDOWS, 'ST': ST_WINDOWS}
+
+
+def start_position(table, start):
+    """ sequential position of the residue start (its resi) in a residue table, None if it is not there """
+    found = np.nonzero(table['resi'] == str(start))[0]
+    return found[0] if len(found) else None
+
+
+def annotate_motif(record, table, angles, dssp, chain_id, p, sequence=(-2, 6), secondary=(-1, 5)):
+    """
+    annotate_motif -- sequence, secondary structure and dihedrals of the
+    motif starting at position p of a chain, taken by position along the
+    chain so insertion codes and odd numbering are fine. The window fields of
+    the motif store record are filled in place.
+
+    PARAMS
+        table, angles
+            residue table and dihedrals of the chain (structure.residue_table,
+            structure.chain_dihedrals)
+        dssp
+            DSSP codes of the file, from run_dssp
+        p
+            position of the motif start in table (start_position), or None
+        sequence, secondary
+            offsets [first, last + 1) from the start reported for each
+
+    RETURNS
+        the sequence, secondary structure and phi_psi cells of the csv row
+    """
+    if p is not None:
+        offsets = np.arange(*sequence)
+        offsets = offsets[(p + offsets >= 0) & (p + offsets < len(table))]
+        record['sequence'][offsets - WINDOW[0]] = encode_sequence(table['resn'][p + offsets])
+    residues = table['resn'][max(p + sequence[0], 0):p + sequence[1]].tolist() if p is not None else []
+    secondary_structure = []
+    for l in range(*secondary):
+        if p is not None and 0 <= p + l < len(table):
+            id_x = (chain_id, (' ', int(table['resv'][p + l]), table['icode'][p + l] or ' '))
+        else:
+            id_x = None
+        sec = dssp.get(id_x, 'Missing')
+        if sec != 'Missing':
+            record['dssp'][l - WINDOW[0]] = sec
+        secondary_structure.append(sec)
+    secondary_structure = list(dict.fromkeys(secondary_structure))
+    if p is None:
+        return residues, secondary_structure, ['error']
+    # i-1 to i+5 sliced from the chain's dihedrals, as cmd.phi_psi
+    # gives them: ((object, CA index), (phi, psi)) where both are defined
+    k = np.arange(max(p-1, 0), min(p+6, len(table)))
+    record['phi'][k - p - WINDOW[0]] = angles['phi'][k]
+    record['psi'][k - p - WINDOW[0]] = angles['psi'][k]
+    record['omega'][k - p - WINDOW[0]] = angles['omega'][k]
+    record['chi1'], record['chi2'] = angles['chi1'][p], angles['chi2'][p]
+    k = k[np.isfinite(angles['phi'][k]) & np.isfinite(angles['psi'][k])]
+    phi_psis = [(('test', int(ca)), (float(phi), float(psi))) for ca, phi, psi in angles[['ca', 'phi', 'psi']][k].tolist()]
+    return residues, secondary_structure, [phi_psis]
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+
+
+# one bit per hydrogen bond of the motif, i is the Asx/Ser/Thr residue
+S2 = 8  # side-chain O of i to N-H of i+2
+S3 = 4  # side-chain O of i to N-H of i+3
+M3 = 2  # main-chain O of i to N-H of i+3
+M4 = 1  # main-chain O of i to N-H of i+4
+
+# an H-bond is formed below HBOND_CUTOFF (A, acceptor...N) and from
+# HBOND_MIN_ANGLE (degrees, acceptor...H-N) up
+HBOND_CUTOFF = 3.5
+HBOND_MIN_ANGLE = 140
+
+# motif classes in the order the old elif ladder tested them; a residue
+# with several side-chain oxygens (Asp) takes the first class any of them
+# satisfies
+MOTIF_RULES = [
+    ('C1', S2 | M3),
+    ('C2', S2 | M3 | M4),
+    ('C2a', S2 | S3 | M3),
+    ('C3', S2 | S3 | M3 | M4),
+    ('C3a', S3 | M3),
+    ('C4', S2 | S3 | M4),
+    ('C4a', S3 | M3 | M4),
+    ('C5', S3 | M4),
+]
+
+# motif residue -> its motif family and the side-chain atoms that may take
+# the i+2 / i+3 H-bonds. One search sweeps every residue of the table, so
+# further families only need rows here, e.g. 'GLN': ('GLX', ['OE1']),
+# 'GLU': ('GLX', ['OE1', 'OE2']) or 'HIS': ('HIS', ['ND1', 'NE2'])
+DONOR_SPECS = {
+    'ASN': ('ASX', ['OD1']),
+    'ASP': ('ASX', ['OD1', 'OD2']),
+    'SER': ('ST', ['OG']),
+    'THR': ('ST', ['OG1']),
+}
+
+
+def family_donors(families, specs=DONOR_SPECS):
+    """ motif residue -> side-chain atoms, for the residues of the families (names, e.g. ('ASX', 'ST')) """
+    return {resn: atoms for resn, (family, atoms) in specs.items() if family in families}
+
+
+def donor_family(resn, specs=DONOR_SPECS):
+    """ family of a motif residue, its name when it is not in specs """
+    return specs[resn][0] if resn in specs else resn
+
+
+FAMILIES = list(dict.fromkeys(family for family, atoms in DONOR_SPECS.values()))
+ASX_DONORS = family_donors(['ASX'])
+ST_DONORS = family_donors(['ST'])
+
+
+def compile_rules(rules=MOTIF_RULES):
+    """ lookup table: H-bond bitmask (0-15) -> rank of its class in rules, -1 for none """
+    table = np.full(16, -1, dtype=int)
+    for rank, (name, mask) in enumerate(rules):
+        if table[mask] == -1:
+            table[mask] = rank
+    return table
+
+
+def hbond_flags(distance, angle, cutoff=HBOND_CUTOFF, min_angle=HBOND_MIN_ANGLE):
+    """
+    formed: distance < cutoff and angle >= min_angle
+    decided: formed, or clearly broken (distance > cutoff or angle < min_angle);
+             a distance exactly at the cutoff was neither in the old ladder
+    """
+    formed = (distance < cutoff) & (angle >= min_angle)
+    broken = (distance > cutoff) | (angle < min_angle)
+    return formed, formed | broken
+
+
+def class_ranks(hbonds, side_chain_atoms, cutoff=HBOND_CUTOFF, min_angle=HBOND_MIN_ANGLE, rules=MOTIF_RULES):
+    """
+    class_ranks -- rank in rules of the class of every candidate, from the
+    arrays returned by hbond_geometry.motif_geometry. cutoff and min_angle
+    may be arrays broadcast against the distances and angles, e.g. a grid
+    of cutoffs (see classify_grid).
+
+    RETURNS
+        rank
+            index of the class in rules, len(rules) when no class matches
+        error
+            True where an atom needed by the rules was missing
+        acceptor
+            index in side_chain_atoms of the atom whose H-bonds give the
+            class (the first, for Asp oxygens giving the same), -1 for none
+    """
+    table = compile_rules(rules)
+    m3, m3_ok = hbond_flags(*hbonds['m3'], cutoff=cutoff, min_angle=min_angle)
+    m4, m4_ok = hbond_flags(*hbonds['m4'], cutoff=cutoff, min_angle=min_angle)
+    error = np.isnan(hbonds['m3'][0]) | np.isnan(hbonds['m4'][0])
+    rank = np.full(np.broadcast(m3, m4).shape, len(rules))
+    acceptor = np.full(rank.shape, -1)
+    for k, atom in enumerate(side_chain_atoms):
+        s2, s2_ok = hbond_flags(*hbonds['s2_' + atom], cutoff=cutoff, min_angle=min_angle)
+        s3, s3_ok = hbond_flags(*hbonds['s3_' + atom], cutoff=cutoff, min_angle=min_angle)
+        error |= np.isnan(hbonds['s2_' + atom][0]) | np.isnan(hbonds['s3_' + atom][0])
+        mask = S2 * s2 + S3 * s3 + M3 * m3 + M4 * m4
+        atom_rank = np.where(s2_ok & s3_ok & m3_ok & m4_ok, table[mask], -1)
+        better = (atom_rank >= 0) & (atom_rank < rank)
+        rank = np.where(better, atom_rank, rank)
+        acceptor = np.where(better, k, acceptor)
+    return rank, error, acceptor
+
+
+def classify(hbonds, side_chain_atoms, cutoff=HBOND_CUTOFF, min_angle=HBOND_MIN_ANGLE, rules=MOTIF_RULES):
+    """
+    classify -- motif class of every candidate from the arrays returned by
+    hbond_geometry.motif_geometry.
+
+    RETURNS
+        labels
+            class name per candidate, None when no class matches
+        error
+            True where an atom needed by the rules was missing
+    """
+    rank, error, acceptor = class_ranks(hbonds, side_chain_atoms, cutoff, min_angle, rules)
+    labels = [rules[r][0] if r < len(rules) and not e else None for r, e in zip(rank, error)]
+    return labels, error
+
+
+def classify_grid(hbonds, side_chain_atoms, cutoffs, min_angles, rules=MOTIF_RULES):
+    """
+    classify_grid -- motif class of every candidate under every pair of a
+    grid of cutoffs (A) and min_angles (degrees), from one set of distances
+    and angles, in one broadcast pass.
+
+    RETURNS
+        rank in rules of the class, shape (candidates, len(cutoffs),
+        len(min_angles)); -1 where no class matches or an atom is missing
+    """
+    grid = {key: (distance[:, None, None], angle[:, None, None]) for key, (distance, angle) in hbonds.items()}
+    rank, error, acceptor = class_ranks(grid, side_chain_atoms, np.asarray(cutoffs)[:, None], np.asarray(min_angles)[None, :], rules)
+    return np.where(error | (rank == len(rules)), -1, rank)
+
+
+def motif_span(label, rules=MOTIF_RULES):
+    """ last residue of a motif relative to i: i+4 if its class has the O...N(i+4) bond, else i+3 """
+    return 4 if dict(rules)[label] & M4 else 3
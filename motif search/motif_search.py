@@ -0,0 +1,453 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+import os
+import pymol
+from pymol import cmd, stored
+import numpy as np
+import __main__
+import pandas as pd
+import sys
+import datetime
+import time
+import argparse
+import multiprocessing
+from hbond_geometry import ChainGeometry, motif_geometry
+from motif_classes import ASX_DONORS, ST_DONORS, FAMILIES, classify, donor_family, family_donors, motif_span
+from interface import add_window_hydrogens, chain_interface_residues, pairwise_interface_residues, window_interface_residues
+from journal import Journal, csv_cells
+from structure import residue_table
+from structure_source import StructureSource, load_pymol, load_structure
+from coord_store import open_store
+import sasa
+import motif_store
+import candidate_table
+
+
+# In[2]:
+
+
+__main__.pymol_argv = [ 'pymol', '-qc']
+def chain_residues(atoms):
+    """
+    residue table (structure.residue_table) of a chain model, one row per
+    residue in sequence order, insertion codes included, or None when the
+    chain has fewer than 5.5 atoms per residue on average (CA-only /
+    incomplete)
+    """
+    residues = residue_table(atoms)
+    if np.average(residues['atoms']) < 5.5:
+        return None
+    return residues
+
+
+def search_chain(pdb_id, chain_id, chains, atoms, residues, donors=ASX_DONORS, interface='window', structure=None, hydrogens='place', tag_family=False, tables=None):
+    """
+    search_chain -- motifs of one chain of the structure loaded (and
+    protonated) as 'test', as [pdb, chain, resi, class, ('surface')] rows,
+    or [pdb, chain, resi, class, family, ('surface')] with tag_family (the
+    family of the motif residue in motif_classes.DONOR_SPECS).
+    All residue types of donors are searched in the same sweep over the
+    chain, sharing its hydrogens and surface check.
+    atoms is the chain model as read from the file, before h_add, and
+    residues its table from chain_residues.
+    structure: the protonated structure.Structure with the NumPy backend,
+    which is then used instead of PyMOL's 'test'.
+    tables: a list the candidate table of the chain (candidate_table.py:
+    distances and angles of every candidate, motif or not) is appended to.
+
+    hydrogens selects where the backbone amide hydrogens come from:
+        'place'     placed from the backbone geometry (default); 'test' is
+                    only protonated around the motifs, for the surface check
+        'h_add'     cmd.h_add on the whole structure, as originally
+        'check'     as 'h_add', and the placed hydrogens are compared to it
+
+    interface selects how the 'surface' flag is found:
+        'window'    dASA of the motif residues only (default)
+        'chain'     dASA of every residue of the chain
+        'pairwise'  the original interfaceResidues run for every chain pair
+    all three give the same flags; the last two are kept for checking.
+    With the NumPy backend 'window' tests the motif residues and the other
+    two the whole chain, with sasa.interface_residues.
+    """
+    chain_motifs = []
+    geometry = chain_geometry(pdb_id, chain_id, atoms, structure, hydrogens)
+    resi = residues['resi']
+    candidates = chain_candidates(residues, donors)
+    hbonds = candidate_geometry(geometry, residues, candidates, donors)
+    if tables is not None:
+        tables.append(candidate_table.chain_table(pdb_id, chain_id, residues, candidates, hbonds, donors))
+    # class of every candidate in one pass per residue type
+    found, family = {}, {}
+    for resn, side_chain_atoms in donors.items():
+        labels, error = classify(hbonds[resn], side_chain_atoms)
+        for x, label, e in zip(candidates[resn], labels, error):
+            if not e and label is not None:
+                found[x] = label
+                family[x] = donor_family(resn)
+    # motif rows name the start residue by number, or by resi with an insertion code
+    positions = sorted(found)
+    for x in positions:
+        start = int(residues['resv'][x]) if residues['icode'][x] == '' else str(resi[x])
+        chain_motifs.append([pdb_id, chain_id, start, found[x]] + ([family[x]] if tag_family else []))
+    print(chain_id, pdb_id)
+    if chain_motifs != []:
+        windows = [resi[x:x + motif_span(found[x]) + 1].tolist() for x in positions]
+        if structure is not None:
+            interface_residues = sasa.interface_residues(structure, chain_id, windows if interface == 'window' else None)
+        elif interface == 'window':
+            if hydrogens == 'place':
+                add_window_hydrogens('test', chain_id, windows)
+            interface_residues = window_interface_residues('test', chain_id, chains, windows)
+        elif interface == 'chain':
+            if hydrogens == 'place':
+                cmd.h_add(selection = 'test')
+            interface_residues = chain_interface_residues('test', chain_id, chains)
+        else:
+            if hydrogens == 'place':
+                cmd.h_add(selection = 'test')
+            interface_residues = pairwise_interface_residues('test', chain_id, chains)
+        #print(interface_residues)
+        interface_residues = set(interface_residues)
+        for n in range(len(chain_motifs)):
+            if interface_residues.intersection(windows[n]):
+                chain_motifs[n].append('surface')
+    return chain_motifs
+
+
+def chain_geometry(pdb_id, chain_id, atoms, structure=None, hydrogens='place'):
+    """ ChainGeometry of a chain for the H-bond tests, with its amide hydrogens as search_chain takes them """
+    if structure is None and hydrogens == 'place':
+        return ChainGeometry(None, model=atoms, place_amide_h=True)
+    if structure is None:
+        geometry = ChainGeometry('chain ' + chain_id)
+        if hydrogens == 'check':
+            check_amide_hydrogens(pdb_id, chain_id, geometry, ChainGeometry(None, model=atoms, place_amide_h=True))
+        return geometry
+    return ChainGeometry(None, model=structure.chain_atoms(chain_id).get_model())
+
+
+def chain_candidates(residues, donors):
+    """
+    positions (rows of residues) of the donor residues followed by four
+    residues of an unbroken chain (peptide bonds, not numbering), per
+    residue type of donors; as before, i+4 may not be the last residue
+    """
+    k = np.arange(len(residues))
+    contiguous = np.zeros(len(residues), dtype=bool)
+    contiguous[:-4] = residues['bonded'][1:-3] & residues['bonded'][2:-2] & residues['bonded'][3:-1] & residues['bonded'][4:]
+    contiguous &= k < len(residues) - 5
+    return {resn: k[contiguous & (residues['resn'] == resn)] for resn in donors}
+
+
+def candidate_geometry(geometry, residues, candidates, donors):
+    """ H-bond distances and angles (hbond_geometry.motif_geometry) of the candidates of each residue type, in one pass per type """
+    return {resn: motif_geometry(geometry, residues['resi'][candidates[resn][:, None] + np.arange(5)], side_chain_atoms)
+            for resn, side_chain_atoms in donors.items()}
+
+
+def check_amide_hydrogens(pdb_id, chain_id, protonated, placed, tolerance=0.01):
+    """ compare the amide hydrogens of two ChainGeometry of a chain, h_add'ed and placed """
+    differ = []
+    deviation = 0.0
+    for resi in sorted(set(protonated.amide_h) | set(placed.amide_h), key=str):
+        a, b = protonated.amide_h.get(resi, []), placed.amide_h.get(resi, [])
+        if len(a) != 1 or len(b) != 1:
+            if len(a) == 1 or len(b) == 1:
+                differ.append(resi)
+            continue
+        d = np.linalg.norm(protonated.coord[a[0]] - placed.coord[b[0]])
+        deviation = max(deviation, d)
+        if d > tolerance:
+            differ.append(resi)
+    print('amide H check {} {}: max deviation {:.4f} A, {} residue(s) differ {}'.format(pdb_id, chain_id, deviation, len(differ), differ))
+    return differ
+
+
+def load_pdb(PDB_path, pdb_id, chain_ids, backend='pymol', structure_file=None, store=None):
+    """
+    load_pdb -- load and clean one structure, as 'test' in PyMOL or as a
+    structure.Structure with backend='numpy', and take the model and the
+    residue table (chain_residues) of every chain in chain_ids. The file is
+    <pdb_id>.pdb, .cif or .bcif in PDB_path, gzipped or not, flat or in the
+    divided layout of a mirror (structure_source.py); structure_file: the
+    file when it has been found already (StructureSource.prefetch).
+    store: folder of a coordinate store (coord_store.py) the structure is
+    taken from instead, with the NumPy backend; no file is read then.
+    Every chain is read, not only chain_ids: the 'surface' check measures
+    the motif residues against the other chains of the structure.
+
+    RETURNS
+        structure (None with PyMOL), the chain ids of the structure, and
+        dicts chain id -> model and chain id -> residue table; None if the
+        file is missing
+    """
+    cmd.select('all')
+    cmd.delete('all')
+    if store is not None:
+        structure = open_store(store).structure(pdb_id)
+        if structure is None:
+            print(store + '/' + pdb_id + ' not in the coordinate store')
+            return None
+        structure = structure.strip()
+        chains = structure.chains()
+    else:
+        if structure_file is None:
+            structure_file = StructureSource(PDB_path).read(pdb_id)
+        if structure_file is None:
+            print(PDB_path + '/' + pdb_id + ' not found')
+            return None
+        print(structure_file.path)
+        structure = None
+        if backend == 'numpy':
+            structure = load_structure(structure_file).strip()
+            chains = structure.chains()
+        else:
+            load_pymol(structure_file, 'test')
+            cmd.remove('solvent')
+            cmd.remove('ino.')
+            cmd.remove('org.')
+            chains = cmd.get_chains('test')
+    # chain models as read from the file; h_add below must not change the
+    # atom counts of chains searched later
+    models, residues = {}, {}
+    for chain_id in chain_ids:
+        if chain_id not in models:
+            if structure is None:
+                models[chain_id] = cmd.get_model('chain ' + chain_id)
+            else:
+                models[chain_id] = structure.chain_atoms(chain_id).get_model()
+            residues[chain_id] = chain_residues(models[chain_id])
+    return structure, chains, models, residues
+
+
+def protonate(structure, residues, hydrogens='place'):
+    """
+    backbone amide hydrogens for the search, once per structure: added to
+    the NumPy structure (returned), or by cmd.h_add on 'test' unless they
+    are placed per chain (hydrogens='place'); nothing if no chain is searched
+    """
+    if any(r is not None and len(r) >= 8 for r in residues.values()):
+        if structure is not None:
+            structure = structure.add_amide_hydrogens()
+        elif hydrogens != 'place':
+            cmd.h_add(selection = 'test')
+    return structure
+
+
+def search_chains(pdb_id, chain_ids, chains, models, residues, donors=ASX_DONORS, interface='window', structure=None, hydrogens='place', tag_family=False, tables=None):
+    """ motif rows of every chain in chain_ids of a loaded (load_pdb) and protonated structure, in that order; tables: see search_chain """
+    pdb_motifs = []
+    for chain_id in chain_ids:
+        if residues[chain_id] is None or len(residues[chain_id]) < 8:
+            pdb_motifs.append([])
+            if tables is not None:
+                tables.append(candidate_table.empty(0))
+            continue
+        pdb_motifs.append(search_chain(pdb_id, chain_id, chains, models[chain_id], residues[chain_id], donors, interface, structure, hydrogens, tag_family, tables))
+    return pdb_motifs
+
+
+def search_pdb(PDB_path, pdb_id, chain_ids, donors=ASX_DONORS, interface='window', backend='pymol', hydrogens='place', tag_family=False, candidates=False, store=None, structure_file=None):
+    """
+    search_pdb -- load, clean and protonate one structure once and search
+    every requested chain of it, with PyMOL or with the NumPy structure
+    backend (backend='numpy', structure.py), which only adds the backbone
+    amide hydrogens. hydrogens: 'place', 'h_add' or 'check', tag_family:
+    see search_chain. store, structure_file: see load_pdb.
+
+    RETURNS
+        a list of motif rows for each chain id in chain_ids, in that order;
+        with candidates, also a candidate table (candidate_table.py) for
+        each
+    """
+    time_start = time.time()
+    chain_ids = [c.replace(' ','') for c in chain_ids]
+    loaded = load_pdb(PDB_path, pdb_id, chain_ids, backend, structure_file, store)
+    if loaded is None:
+        if candidates:
+            return [[] for c in chain_ids], [candidate_table.empty(0) for c in chain_ids]
+        return [[] for c in chain_ids]
+    structure, chains, models, residues = loaded
+    structure = protonate(structure, residues, hydrogens)
+    tables = [] if candidates else None
+    pdb_motifs = search_chains(pdb_id, chain_ids, chains, models, residues, donors, interface, structure, hydrogens, tag_family, tables)
+    cmd.select('all')
+    cmd.delete('all')
+    print('{} {} chain(s) {:.2f} s'.format(pdb_id, len(chain_ids), time.time() - time_start))
+    if candidates:
+        return pdb_motifs, tables
+    return pdb_motifs
+
+
+def _search_pdb(work):
+    return search_pdb(*work)
+
+
+def chain_rows(PDB_csv, chain_csv, start, end):
+    """
+    rows start to end of PDB_csv / chain_csv, without the PDB ids in
+    failed_PDB_pdb/ (if there is such a folder)
+
+    RETURNS
+        the PDB ids and chain ids of the rows, and the row numbers grouped
+        by PDB id, so that each structure is loaded once for all its chains
+    """
+    PDB_list = pd.read_csv(PDB_csv)
+    chain_list = pd.read_csv(chain_csv)
+    pdb = PDB_list.iloc[:,1]
+    chain = chain_list.iloc[:,1]
+    fail_pdb = os.listdir('failed_PDB_pdb/') if os.path.isdir('failed_PDB_pdb/') else []
+    fail_pdb = [i.replace('.pdb','') for i in fail_pdb]
+    print(len(fail_pdb))
+    print(fail_pdb[:5])
+    start = int(start)
+    end = int(end)
+    if start == 0:
+        pdb = list(pdb[:end])
+        chain = list(chain[:end])
+    else:
+        pdb = list(pdb[start-1:end])
+        chain = list(chain[start-1:end])
+    #print(pdb[:20], chain[:20])
+    length = end - start
+    groups = {}
+    for i in range(length):
+        if pdb[i] not in fail_pdb:
+            groups.setdefault(str(pdb[i]), []).append(i)
+    return pdb, chain, groups
+
+
+def read_PDB(PDB_path, PDB_csv, chain_csv, start, end, csv_name, donors=ASX_DONORS, workers=1, interface='window', resume=False, backend='pymol', hydrogens='place', families=None, prefetch=4, store=None, candidates=False):
+    """
+    read_PDB -- search Schellman-like motifs of the residues in donors
+    (e.g. ASX_DONORS or ST_DONORS from motif_classes) in the chains listed
+    by PDB_csv / chain_csv, rows start to end, and write them to csv_name.csv
+    as [pdb, chain, resi, class, ('surface')], and to the motif store
+    csv_name.npy (motif_store.py) read by the later stages.
+
+    Rows are grouped by PDB id so that each structure is loaded once for all
+    of its chains. With workers > 1 the structures are handed out one at a
+    time to a pool of processes, each with its own PyMOL session, so a large
+    complex only holds up the worker it landed on. Results are collected in
+    input order, so the csv is the same as from a serial run. A serial run
+    finds, reads and decompresses the next prefetch files in background
+    threads while it searches (structure_source.py); workers read their own
+    files. PDB_path may be a flat folder or a divided mirror of
+    .ent.gz/.cif.gz files. store: a coordinate store compiled from
+    PDB_path (coord_store.py) the structures are taken from instead, with
+    the NumPy backend, so no file is parsed.
+
+    interface: 'window', 'chain' or 'pairwise', see search_chain.
+    backend: 'pymol' or 'numpy', see search_pdb.
+    hydrogens: 'place', 'h_add' or 'check', see search_chain.
+    families: motif families of motif_classes.DONOR_SPECS (e.g. ['ASX', 'ST'])
+    searched together, in one sweep per chain, instead of donors. The motifs
+    of each family go to csv_name_<family>.csv and .npy, as from
+    search_ASX/ST, and all of them, tagged with their family, to the motif
+    store csv_name.npy.
+    candidates: also write the raw H-bond distances and angles of every
+    candidate residue, motif or near miss, with the side-chain oxygen that
+    gave its class, as the float32 columns of csv_name.candidates.npz
+    (candidate_table.py), for reclassification and checks without the
+    structures (cutoff_sweep.sweep_table).
+
+    Finished (pdb, chain) pairs are appended to csv_name.journal.jsonl as
+    they complete; with resume=True the pairs already in the journal are not
+    searched again. The csv is written once, at the end.
+    """
+    time_stamp = datetime.datetime.now()
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    pdb, chain, groups = chain_rows(PDB_csv, chain_csv, start, end)
+    workers = int(workers)
+    if families is not None:
+        donors = family_donors(families)
+    if store is not None:
+        backend = 'numpy'
+    journal = Journal(csv_name + '.journal.jsonl', resume)
+    # the candidate tables of the finished pairs, kept apart from the motifs
+    tables_journal = Journal(csv_name + '.candidates.journal.jsonl', resume) if candidates else None
+    row_motifs = {}
+    row_tables = {}
+    todo = {}
+    for pdb_id, rows in groups.items():
+        keys = [pdb_id + '/' + str(chain[i]) for i in rows]
+        if all(key in journal and (tables_journal is None or key in tables_journal) for key in keys):
+            row_motifs.update((i, journal.done[key]) for i, key in zip(rows, keys))
+            if candidates:
+                row_tables.update((i, candidate_table.from_dict(tables_journal.done[key])) for i, key in zip(rows, keys))
+        else:
+            todo[pdb_id] = rows
+    work = [(PDB_path, pdb_id, [str(chain[i]) for i in rows], donors, interface, backend, hydrogens, families is not None, candidates, store) for pdb_id, rows in todo.items()]
+    if workers > 1:
+        pool = multiprocessing.get_context('spawn').Pool(workers)
+        results = pool.imap(_search_pdb, work, chunksize=1)
+    elif store is not None:
+        pool = None
+        results = map(_search_pdb, work)
+    else:
+        pool = None
+        files = StructureSource(PDB_path, prefetch).prefetch(todo)
+        results = (_search_pdb(w + (f,)) for w, (pdb_id, f) in zip(work, files))
+    for (pdb_id, rows), pdb_motifs in zip(todo.items(), results):
+        if candidates:
+            pdb_motifs, tables = pdb_motifs
+            tables_journal.record({pdb_id + '/' + str(chain[i]): candidate_table.as_dict(table) for i, table in zip(rows, tables)})
+            row_tables.update(zip(rows, tables))
+        pdb_motifs = [[csv_cells(m) for m in chain_motifs] for chain_motifs in pdb_motifs]
+        journal.record({pdb_id + '/' + str(chain[i]): chain_motifs for i, chain_motifs in zip(rows, pdb_motifs)})
+        row_motifs.update(zip(rows, pdb_motifs))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    journal.close()
+    if candidates:
+        tables_journal.close()
+        candidate_table.save(csv_name + '.candidates.npz', candidate_table.concatenate([row_tables[i] for i in sorted(row_tables)]))
+    motif_total = [m for i in sorted(row_motifs) for m in row_motifs[i]]
+    time_stamp = datetime.datetime.now()
+    if families is None:
+        df = pd.DataFrame(motif_total)
+        df.to_csv(csv_name + '.csv')
+        motif_store.save(csv_name + '.npy', motif_store.motif_records(motif_total))
+    else:
+        # family tags out of the rows: [pdb, chain, resi, class, family, ('surface')]
+        for family in families:
+            family_motifs = [m[:4] + m[5:] for m in motif_total if m[4] == family]
+            pd.DataFrame(family_motifs).to_csv(csv_name + '_' + family + '.csv')
+            motif_store.save(csv_name + '_' + family + '.npy', motif_store.motif_records(family_motifs, family))
+        records = motif_store.motif_records([m[:4] + m[5:] for m in motif_total])
+        records['family'] = [m[4] for m in motif_total]
+        motif_store.save(csv_name + '.npy', records)
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    return motif_total
+
+
+def parse_args(argv=None, families=False):
+    """ command line of search_ASX/ST; families=True adds --families, for search_motifs """
+    parser = argparse.ArgumentParser(description='search ASX/ST motifs in local PDB files')
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb, .cif or .bcif files (optionally .gz), or a divided mirror (xy/pdb1xyz.ent.gz)')
+    parser.add_argument('PDB_csv', help='csv of PDB ids, e.g. nonredundant_PDBID.csv')
+    parser.add_argument('chain_csv', help='csv of chain ids, e.g. nonredundant_CHAINID.csv')
+    parser.add_argument('start', help='first row of the csv files to search')
+    parser.add_argument('end', help='last row of the csv files to search')
+    parser.add_argument('csv_name', help='output file name, without .csv')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--interface', choices=['window', 'chain', 'pairwise'], default='window',
+                        help="surface check: motif residues only (default), whole chain, or every chain pair as originally")
+    parser.add_argument('--resume', action='store_true', help='skip the chains already in <csv_name>.journal.jsonl')
+    parser.add_argument('--backend', choices=['pymol', 'numpy'], default='pymol',
+                        help='structure handling with PyMOL (default) or the PyMOL-free NumPy loader')
+    parser.add_argument('--hydrogens', choices=['place', 'h_add', 'check'], default='place',
+                        help='backbone N-H placed from geometry (default), from cmd.h_add, or both compared (PyMOL backend)')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read and decompressed ahead in background threads by a serial run (default 4, 0 for none)')
+    parser.add_argument('--store', help='coordinate store compiled from PDB_path by coord_store.py, searched with the NumPy backend instead of the files')
+    parser.add_argument('--candidates', action='store_true',
+                        help='also write the H-bond distances and angles of every candidate, motif or not, to <csv_name>.candidates.npz')
+    if families:
+        parser.add_argument('--families', nargs='+', choices=FAMILIES, default=FAMILIES,
+                            help='motif families searched together (default: %(default)s)')
+    return parser.parse_args(argv)
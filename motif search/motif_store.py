@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+
+# residue offsets from the motif start i covered by the window fields:
+# ASX sequences span i-2 to i+5, ST sequences i-1 to i+4, DSSP and phi/psi
+# lie inside; slot = offset + 2
+WINDOW = np.arange(-2, 6)
+# residue name codes of the sequence field; OTHER stands for any other
+# residue (e.g. MSE), -1 for no residue
+RESIDUE_NAMES = ['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLN', 'GLU', 'GLY', 'HIS', 'ILE',
+                 'LEU', 'LYS', 'MET', 'PHE', 'PRO', 'SER', 'THR', 'TRP', 'TYR', 'VAL']
+OTHER = len(RESIDUE_NAMES)
+# most residue pairs a contacts field holds (count_hydrophobic_interaction --pairs)
+MAX_PAIRS = 8
+
+# one motif; each stage fills its own fields and passes the others on
+# (family: 'ASX' or 'ST', set where both are stored together; chi1/chi2:
+# side-chain dihedrals of the donor residue i)
+MOTIF = np.dtype([('pdb', 'U12'), ('chain', 'U4'), ('start', 'U8'), ('class', 'U4'), ('family', 'U4'), ('surface', bool),
+                  ('sequence', 'i1', len(WINDOW)), ('dssp', 'S1', len(WINDOW)),
+                  ('phi', 'f4', len(WINDOW)), ('psi', 'f4', len(WINDOW)), ('omega', 'f4', len(WINDOW)),
+                  ('chi1', 'f4'), ('chi2', 'f4'),
+                  ('contacts', 'i1', MAX_PAIRS)])
+
+_CODES = {name: code for code, name in enumerate(RESIDUE_NAMES)}
+
+
+def empty(n):
+    """ n motif records with every field unset (codes -1, angles nan, no DSSP) """
+    records = np.zeros(n, dtype=MOTIF)
+    records['sequence'] = -1
+    for angle in ('phi', 'psi', 'omega', 'chi1', 'chi2'):
+        records[angle] = np.nan
+    records['contacts'] = -1
+    return records
+
+
+def encode_sequence(names):
+    return np.array([_CODES.get(name, OTHER) for name in names], dtype='i1')
+
+
+def residue_name(code):
+    """ residue name of a sequence code, 'UNK' for OTHER, '' for no residue """
+    if code < 0:
+        return ''
+    return RESIDUE_NAMES[code] if code < OTHER else 'UNK'
+
+
+def decode_sequence(codes):
+    """ residue names of a sequence field, the unset slots left out """
+    return [residue_name(c) for c in codes if c >= 0]
+
+
+def motif_records(rows, family=''):
+    """ records of search rows [pdb, chain, resi, class, ('surface')] """
+    records = empty(len(rows))
+    records['family'] = family
+    for record, row in zip(records, rows):
+        record['pdb'], record['chain'], record['start'], record['class'] = (str(v) for v in row[:4])
+        record['surface'] = len(row) > 4 and row[4] == 'surface'
+    return records
+
+
+def read_motifs(path):
+    """
+    read_motifs -- the motifs of a motif store (.npy) or of a csv written by
+    search_ASX/ST or get_seq_sec_dihed (only its pdb, chain, resi, class and
+    surface columns are read).
+    """
+    if path.endswith('.npy'):
+        records = load(path)
+        if records.dtype == MOTIF:
+            return records
+        # a store of an earlier version: its fields, the newer ones unset
+        motifs = empty(len(records))
+        for name in records.dtype.names:
+            if name in MOTIF.names:
+                motifs[name] = records[name]
+        return motifs
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return motif_records(df.iloc[:, 1:6].values.tolist())
+
+
+def as_dict(record):
+    """ a record as JSON-serialisable values (for the journals) """
+    value = {name: record[name].tolist() for name in MOTIF.names}
+    value['dssp'] = [c.decode() for c in value['dssp']]
+    return value
+
+
+def from_dicts(values):
+    """ records from as_dict values; fields missing from a value stay unset """
+    records = empty(len(values))
+    for record, value in zip(records, values):
+        for name in MOTIF.names:
+            if name in value:
+                record[name] = value[name]
+    return records
+
+
+def save(path, records):
+    """ write records to path (.npy) """
+    np.save(path, np.asarray(records, dtype=MOTIF))
+
+
+def load(path, mmap=True):
+    """ the records of a motif store, memory-mapped (read-only) unless mmap is False """
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+
+def to_frame(records):
+    """ records as a DataFrame: one column per scalar field, one per window slot of the others (e.g. 'phi_-1') """
+    columns = {}
+    for name in records.dtype.names:
+        values = records[name]
+        if values.ndim == 1:
+            columns[name] = values
+        elif name == 'contacts':
+            for k in range(values.shape[1]):
+                columns['%s_%d' % (name, k)] = values[:, k]
+        else:
+            for slot, offset in enumerate(WINDOW):
+                columns['%s_%d' % (name, offset)] = values[:, slot]
+    return pd.DataFrame(columns)
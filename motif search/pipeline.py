@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+import os
+import sys
+import time
+import datetime
+import argparse
+import multiprocessing
+import numpy as np
+import __main__
+from pymol import cmd
+from motif_classes import FAMILIES, family_donors
+from motif_search import chain_rows, load_pdb, protonate, search_chains
+from motif_annotation import ASX_WINDOWS, FAMILY_WINDOWS, annotate_motif, start_position
+from dssp_cache import DSSPCache, DEFAULT_CACHE_DIR, run_dssp
+from journal import Journal
+from structure import chain_dihedrals
+from structure_source import StructureSource
+import motif_store
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bioinformatics', 'count_hydrophobic_interactions'))
+from hydrophobic_contacts import SideChainCarbons, CONTACT_PAIRS, motif_contacts, parse_pairs
+
+
+# In[2]:
+
+
+__main__.pymol_argv = [ 'pymol', '-qc']
+
+# one DSSPCache per process, opened on first use
+_dssp_caches = {}
+
+
+def _dssp_cache(cache_dir, size):
+    if cache_dir is None:
+        return None
+    if (cache_dir, size) not in _dssp_caches:
+        _dssp_caches[(cache_dir, size)] = DSSPCache(cache_dir, max_bytes=size * 1024**2)
+    return _dssp_caches[(cache_dir, size)]
+
+
+def annotate_pdb(PDB_path, pdb_id, chain_ids, families=('ASX', 'ST'), interface='window', backend='pymol', hydrogens='place',
+                 dssp_cache=DEFAULT_CACHE_DIR, dssp_cache_size=2048, pairs=CONTACT_PAIRS, cutoff=4.5, store=None, structure_file=None):
+    """
+    annotate_pdb -- every stage for one structure from a single load: the
+    motif search of all families in one sweep per chain (search_motifs),
+    sequence, DSSP and dihedrals (get_seq_sec_dihed_ASX/ST) and hydrophobic
+    contacts (count_hydrophobic_interaction_ASX/ST). DSSP runs once for the
+    file, and dihedrals and side-chain carbons are taken once per chain.
+    interface, backend, hydrogens, store and structure_file as in
+    search_pdb; with a store the file is still read, for DSSP.
+
+    RETURNS
+        motif store records (motif_store.py), tagged with their family, for
+        each chain id in chain_ids, in that order
+    """
+    time_start = time.time()
+    chain_ids = [c.replace(' ','') for c in chain_ids]
+    if structure_file is None:
+        structure_file = StructureSource(PDB_path).read(pdb_id)
+    if structure_file is None:
+        print(PDB_path + '/' + pdb_id + ' not found')
+        return [motif_store.empty(0) for c in chain_ids]
+    loaded = load_pdb(PDB_path, pdb_id, chain_ids, backend, structure_file, store)
+    if loaded is None:
+        return [motif_store.empty(0) for c in chain_ids]
+    structure, chains, models, residues = loaded
+    # dihedrals and contacts come from the structure as load_pdb leaves it,
+    # without solvent and ligands as in count_hydrophobic_interaction, and
+    # before any hydrogens are added for the search
+    if structure is None:
+        carbons = SideChainCarbons('test')
+    else:
+        carbons = SideChainCarbons('test', model=structure.get_model())
+    dihedrals = {chain_id: chain_dihedrals(models[chain_id]) for chain_id in models if residues[chain_id] is not None}
+    structure = protonate(structure, residues, hydrogens)
+    pdb_motifs = search_chains(pdb_id, chain_ids, chains, models, residues, family_donors(families), interface, structure, hydrogens, tag_family=True)
+    cmd.delete('all')
+    # DSSP only for files with motifs to annotate
+    if not any(pdb_motifs):
+        print('{} {} chain(s) {:.2f} s'.format(pdb_id, len(chain_ids), time.time() - time_start))
+        return [motif_store.empty(0) for c in chain_ids]
+    dssp = run_dssp(structure_file.path, _dssp_cache(dssp_cache, dssp_cache_size), data=structure_file.data)
+    pdb_records = []
+    for chain_id, chain_motifs in zip(chain_ids, pdb_motifs):
+        # rows [pdb, chain, resi, class, family, ('surface')]
+        records = motif_store.motif_records([m[:4] + m[5:] for m in chain_motifs])
+        for record, motif in zip(records, chain_motifs):
+            table = residues[chain_id]
+            record['family'] = motif[4]
+            annotate_motif(record, table, dihedrals[chain_id], dssp, chain_id, start_position(table, motif[2]), **FAMILY_WINDOWS.get(motif[4], ASX_WINDOWS))
+            inter, pocket = motif_contacts(carbons, chain_id, motif[2], pairs, cutoff)
+            record['contacts'][:len(pairs)] = inter
+        pdb_records.append(records)
+    print('{} {} chain(s) {:.2f} s'.format(pdb_id, len(chain_ids), time.time() - time_start))
+    return pdb_records
+
+
+def _annotate_pdb(work):
+    return annotate_pdb(*work)
+
+
+def run_pipeline(PDB_path, PDB_csv, chain_csv, start, end, output, families=('ASX', 'ST'), workers=1, interface='window', resume=False,
+                 backend='pymol', hydrogens='place', dssp_cache=DEFAULT_CACHE_DIR, dssp_cache_size=2048, pairs=CONTACT_PAIRS, cutoff=4.5,
+                 prefetch=4, store=None):
+    """
+    run_pipeline -- search, annotate and count hydrophobic contacts of the
+    ASX and/or ST motifs of the chains in rows start to end of PDB_csv /
+    chain_csv, loading each PDB file once (annotate_pdb), instead of once
+    per stage and family. Every motif becomes one consolidated record of
+    the motif store output.npy, tagged with its family; output.csv holds
+    the same records as a table (motif_store.to_frame).
+
+    workers, resume and prefetch as in read_PDB: structures are handed out
+    one at a time to a pool of processes, or read ahead in threads by a
+    serial run, and finished (pdb, chain) pairs are kept in
+    output.journal.jsonl. store: coordinate store (coord_store.py) the
+    structures are taken from, with the NumPy backend; the files are still
+    read for DSSP.
+    """
+    if len(pairs) > motif_store.MAX_PAIRS:
+        raise ValueError('at most {} residue pairs fit the motif store'.format(motif_store.MAX_PAIRS))
+    if store is not None:
+        backend = 'numpy'
+    time_stamp = datetime.datetime.now()
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    pdb, chain, groups = chain_rows(PDB_csv, chain_csv, start, end)
+    workers = int(workers)
+    journal = Journal(output + '.journal.jsonl', resume)
+    row_records = {}
+    todo = {}
+    for pdb_id, rows in groups.items():
+        keys = [pdb_id + '/' + str(chain[i]) for i in rows]
+        if all(key in journal for key in keys):
+            row_records.update((i, motif_store.from_dicts(journal.done[key])) for i, key in zip(rows, keys))
+        else:
+            todo[pdb_id] = rows
+    work = [(PDB_path, pdb_id, [str(chain[i]) for i in rows], families, interface, backend, hydrogens, dssp_cache, dssp_cache_size, pairs, cutoff, store)
+            for pdb_id, rows in todo.items()]
+    if workers > 1:
+        pool = multiprocessing.get_context('spawn').Pool(workers)
+        results = pool.imap(_annotate_pdb, work, chunksize=1)
+    else:
+        pool = None
+        files = StructureSource(PDB_path, prefetch).prefetch(todo)
+        results = (_annotate_pdb(w + (f,)) for w, (pdb_id, f) in zip(work, files))
+    for (pdb_id, rows), pdb_records in zip(todo.items(), results):
+        journal.record({pdb_id + '/' + str(chain[i]): [motif_store.as_dict(r) for r in records] for i, records in zip(rows, pdb_records)})
+        row_records.update(zip(rows, pdb_records))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    journal.close()
+    records = np.concatenate([row_records[i] for i in sorted(row_records)] + [motif_store.empty(0)])
+    motif_store.save(output + '.npy', records)
+    motif_store.to_frame(records).to_csv(output + '.csv')
+    time_stamp = datetime.datetime.now()
+    print("time_stamp       " + time_stamp.strftime('%Y.%m.%d-%H:%M:%S'))
+    return records
+
+
+# In[ ]:
+
+
+if __name__== "__main__":
+    parser = argparse.ArgumentParser(description='search, sequence/DSSP/dihedrals and hydrophobic contacts of ASX and ST motifs, one load per PDB file')
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb, .cif or .bcif files (optionally .gz), or a divided mirror (xy/pdb1xyz.ent.gz)')
+    parser.add_argument('PDB_csv', help='csv of PDB ids, e.g. nonredundant_PDBID.csv')
+    parser.add_argument('chain_csv', help='csv of chain ids, e.g. nonredundant_CHAINID.csv')
+    parser.add_argument('start', help='first row of the csv files to search')
+    parser.add_argument('end', help='last row of the csv files to search')
+    parser.add_argument('output', help='output name, written to <output>.npy and <output>.csv')
+    parser.add_argument('--families', nargs='+', choices=FAMILIES, default=FAMILIES, help='motif families to search (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes (default 1)')
+    parser.add_argument('--interface', choices=['window', 'chain', 'pairwise'], default='window',
+                        help="surface check: motif residues only (default), whole chain, or every chain pair as originally")
+    parser.add_argument('--resume', action='store_true', help='skip the chains already in <output>.journal.jsonl')
+    parser.add_argument('--backend', choices=['pymol', 'numpy'], default='pymol',
+                        help='structure handling with PyMOL (default) or the PyMOL-free NumPy loader')
+    parser.add_argument('--hydrogens', choices=['place', 'h_add', 'check'], default='place',
+                        help='backbone N-H placed from geometry (default), from cmd.h_add, or both compared (PyMOL backend)')
+    parser.add_argument('--dssp-cache', default=DEFAULT_CACHE_DIR, help='DSSP cache folder (default %(default)s)')
+    parser.add_argument('--dssp-cache-size', type=int, default=2048, help='DSSP cache size limit in MB (default 2048)')
+    parser.add_argument('--no-dssp-cache', dest='dssp_cache', action='store_const', const=None, help='always run mkdssp')
+    parser.add_argument('--pairs', type=parse_pairs, default=CONTACT_PAIRS, help="residue pairs to test, e.g. \"N'-N4,N'-N3,N3-N4\" (default N'-N4,N'-N3,N3-N4)")
+    parser.add_argument('--cutoff', type=float, default=4.5, help='side-chain carbon contact distance in A (default 4.5)')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read and decompressed ahead in background threads by a serial run (default 4, 0 for none)')
+    parser.add_argument('--store', help='coordinate store compiled from PDB_path by coord_store.py, read with the NumPy backend; the files are still read for DSSP')
+    args = parser.parse_args()
+    run_pipeline(args.PDB_path, args.PDB_csv, args.chain_csv, args.start, args.end, args.output, tuple(args.families), args.workers,
+                 args.interface, args.resume, args.backend, args.hydrogens, args.dssp_cache, args.dssp_cache_size, args.pairs, args.cutoff,
+                 args.prefetch, args.store)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import itertools
+import numpy as np
+from scipy.spatial import cKDTree
+from structure import split_resi
+
+
+# PyMOL's vdW radii and solvent radius, used by get_area
+VDW_RADII = {'H': 1.2, 'D': 1.2, 'C': 1.7, 'N': 1.55, 'O': 1.52, 'S': 1.8, 'P': 1.8, 'SE': 1.9}
+DEFAULT_RADIUS = 1.8
+PROBE = 1.4
+# PyMOL's default dot_density
+DOT_DENSITY = 2
+
+
+def dot_sphere(density=DOT_DENSITY):
+    """
+    the dots get_area puts on a unit sphere and the area each stands for:
+    an icosahedron, its edges halved density times, with every vertex
+    weighted by a third of the spherical triangles around it
+    (162 dots for density 2, in PyMOL's orientation)
+    """
+    t = (1 + 5 ** 0.5) / 2
+    vertices = [(t, 1, 0), (t, -1, 0), (-t, 1, 0), (-t, -1, 0), (1, 0, t), (-1, 0, t),
+                (1, 0, -t), (-1, 0, -t), (0, t, 1), (0, t, -1), (0, -t, 1), (0, -t, -1)]
+    vertices = [np.array(v) / np.linalg.norm(v) for v in vertices]
+    faces = [(i, j, k) for i, j, k in itertools.combinations(range(12), 3)
+             if max(np.linalg.norm(vertices[i] - vertices[j]), np.linalg.norm(vertices[j] - vertices[k]),
+                    np.linalg.norm(vertices[k] - vertices[i])) < 1.1]
+    for _ in range(density):
+        middle = {}
+        def split(i, j):
+            if (i, j) not in middle:
+                m = vertices[i] + vertices[j]
+                vertices.append(m / np.linalg.norm(m))
+                middle[i, j] = middle[j, i] = len(vertices) - 1
+            return middle[i, j]
+        faces = [f for i, j, k in faces for f in
+                 ((i, split(i, j), split(k, i)), (j, split(j, k), split(i, j)),
+                  (k, split(k, i), split(j, k)), (split(i, j), split(j, k), split(k, i)))]
+    points, faces = np.array(vertices), np.array(faces)
+    a, b, c = points[faces[:, 0]], points[faces[:, 1]], points[faces[:, 2]]
+    # spherical triangle areas (Van Oosterom and Strackee)
+    triple = np.abs(np.sum(a * np.cross(b, c), axis=1))
+    area = 2 * np.arctan2(triple, 1 + np.sum(a * b, axis=1) + np.sum(b * c, axis=1) + np.sum(c * a, axis=1))
+    weights = np.zeros(len(points))
+    for k in range(3):
+        np.add.at(weights, faces[:, k], area / 3)
+    return points, weights
+
+
+def vdw_radii(element):
+    return np.array([VDW_RADII.get(e, DEFAULT_RADIUS) for e in element], dtype=float)
+
+
+def buried_points(points, owner, coord, radii, probe=PROBE):
+    """
+    mask of the surface points that lie inside the probe-expanded sphere of
+    an atom of coord other than their own atom (owner, a row of coord or -1)
+    """
+    buried = np.zeros(len(points), dtype=bool)
+    if len(coord) == 0 or len(points) == 0:
+        return buried
+    pairs = cKDTree(points).sparse_distance_matrix(cKDTree(coord), radii.max() + probe, output_type='ndarray')
+    inside = (pairs['v'] < radii[pairs['j']] + probe) & (pairs['j'] != owner[pairs['i']])
+    buried[pairs['i'][inside]] = True
+    return buried
+
+
+def interface_residues(structure, chain_id, windows=None, cutoff=1.0, probe=PROBE, density=DOT_DENSITY):
+    """
+    interface_residues -- residue ids of chain_id whose per-atom SASA
+    changes by cutoff or more when any other chain is added, the NumPy
+    counterpart of interface.window_interface_residues (windows given) or
+    interface.chain_interface_residues (windows None).
+
+    The areas are get_area's: the structure is protonated as by cmd.h_add
+    (Structure.add_hydrogens), and the dots, their weights and the radii
+    are PyMOL's (dot_sphere, VDW_RADII), so the flags are those of the
+    PyMOL backend.
+
+    PARAMS
+        structure
+            a structure.Structure without solvent/ligands
+        windows
+            residue id lists of chain_id to test, all residues if None
+    """
+    atoms = structure.add_hydrogens()
+    radii = vdw_radii(atoms.element)
+    in_chain = atoms.chain == chain_id
+    targets = in_chain.copy()
+    if windows is not None:
+        targets &= np.isin(atoms.resi, [resi for window in windows for resi in window])
+    targets = np.nonzero(targets)[0]
+    if len(targets) == 0:
+        return []
+    sphere, weights = dot_sphere(density)
+    n_points = len(sphere)
+    # surface dots of every target atom, atom after atom
+    points = (atoms.coord[targets][:, None, :] + (radii[targets] + probe)[:, None, None] * sphere[None, :, :]).reshape(-1, 3)
+    area = (radii[targets] + probe)[:, None] ** 2 * weights[None, :]
+    chain_rows = np.nonzero(in_chain)[0]
+    # target rows as rows of the chain atoms, to skip each dot's own atom
+    owner = np.repeat(np.searchsorted(chain_rows, targets), n_points)
+    exposed = ~buried_points(points, owner, atoms.coord[chain_rows], radii[chain_rows], probe)
+    reach = radii[targets].max() + radii.max() + 2 * probe
+    tree = cKDTree(atoms.coord[targets])
+    residues = set()
+    for partner in atoms.chains():
+        if partner == chain_id:
+            continue
+        rows = np.nonzero(atoms.chain == partner)[0]
+        # partners out of reach of every target atom cannot bury any of it
+        if not np.isfinite(tree.query(atoms.coord[rows], k=1, distance_upper_bound=reach)[0]).any():
+            continue
+        covered = buried_points(points, np.full(len(points), -1), atoms.coord[rows], radii[rows], probe)
+        d_area = ((exposed & covered).reshape(-1, n_points) * area).sum(axis=1)
+        residues.update(atoms.resi[targets[d_area >= cutoff]])
+    return sorted((str(resi) for resi in residues), key=split_resi)
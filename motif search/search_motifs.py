@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+from motif_classes import FAMILIES
+import motif_search
+
+
+# In[2]:
+
+
+def read_PDB(PDB_path, PDB_csv, chain_csv, start, end, csv_name, families=FAMILIES, **options):
+    return motif_search.read_PDB(PDB_path, PDB_csv, chain_csv, start, end, csv_name, families=families, **options)
+
+
+# In[3]:
+
+
+#test = read_PDB('PDB_10000_final', 'nonredundant_PDBID.csv', 'nonredundant_CHAINID.csv', 0, 10, 'motifs_test')
+
+
+# In[4]:
+
+
+if __name__== "__main__":
+    read_PDB(**vars(motif_search.parse_args(families=True)))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# In[1]:
+
+
+import numpy as np
+import __main__
+import pandas as pd
+import argparse
+from pymol import cmd
+from dssp_cache import DSSPCache, DEFAULT_CACHE_DIR, run_dssp
+from journal import Journal, csv_cells
+from structure import residue_table, chain_dihedrals
+from structure_source import StructureSource, load_pymol, load_structure
+from coord_store import open_store
+from motif_annotation import ASX_WINDOWS, annotate_motif, start_position
+import motif_store
+
+
+# In[2]:
+
+
+__main__.pymol_argv = [ 'pymol', '-qc']
+def get_sequence_secondary_stucture(PDB_path, csv_path, output, dssp_cache=DEFAULT_CACHE_DIR, dssp_cache_size=2048, resume=False, backend='pymol', prefetch=4, store=None, windows=ASX_WINDOWS):
+    """
+    get_sequence_secondary_stucture -- sequence, DSSP secondary structure and
+    dihedrals of the motifs of a search output, shared by
+    get_seq_sec_dihed_ASX.py and get_seq_sec_dihed_ST.py, which differ only
+    in windows (motif_annotation.ASX_WINDOWS / ST_WINDOWS: the residues
+    around the motif start that are reported).
+
+    dssp_cache: folder of the on-disk DSSP cache (see dssp_cache.py), None to
+    always run mkdssp; dssp_cache_size: its size limit in MB
+    resume: skip the motifs already recorded in output.journal.jsonl
+    backend: 'pymol', or 'numpy' to read structures and dihedrals with
+    structure.py, which keeps only the atoms of the motif chains
+    csv_path: the search output without .csv, or its motif store (.npy);
+    the results go to output.csv and, per residue of the window, to the
+    motif store output.npy
+    PDB_path: folder of structure files, flat or a divided mirror; prefetch:
+    number of files read ahead in background threads (structure_source.py)
+    store: a coordinate store compiled from PDB_path (coord_store.py) the
+    coordinates are taken from, with the NumPy backend; the files are
+    still read for DSSP
+    """
+    motifs = motif_store.read_motifs(csv_path if csv_path.endswith('.npy') else csv_path + '.csv')
+    #get sequence
+    pdb_id = motifs['pdb'].tolist()
+    chain_id = motifs['chain'].tolist()
+    start_id = motifs['start'].tolist()
+    loop_type = motifs['class'].tolist()
+    surface = ['surface' if s else np.nan for s in motifs['surface']]
+    records = np.array(motifs)
+    if store is not None:
+        backend = 'numpy'
+    cache = DSSPCache(dssp_cache, max_bytes=dssp_cache_size * 1024**2) if dssp_cache else None
+    # motifs from the same PDB file share one load and one DSSP run
+    groups = {}
+    for i in range(len(pdb_id)):
+        groups.setdefault(pdb_id[i], []).append(i)
+    journal = Journal(output + '.journal.jsonl', resume)
+    key = lambda i: '{}/{}/{}/{}'.format(i, pdb_id[i], chain_id[i], start_id[i])
+    rows = {}
+    todo = []
+    for pdb, group in groups.items():
+        # journals of earlier versions hold only the csv row; redo those
+        if all(isinstance(journal.done.get(key(i)), dict) for i in group):
+            for i in group:
+                rows[i] = journal.done[key(i)]['row']
+                records[i] = motif_store.from_dicts([journal.done[key(i)]['motif']])[0]
+        else:
+            todo.append(pdb)
+    for pdb, structure_file in StructureSource(PDB_path, prefetch).prefetch(todo):
+        group = groups[pdb]
+        cmd.select('all')
+        cmd.delete('all')
+        if structure_file is None:
+            continue
+        structure = None
+        if backend == 'numpy':
+            chains = {chain_id[i] for i in group}
+            if store is not None:
+                structure = open_store(store).structure(pdb, chains)
+            if structure is None:
+                structure = load_structure(structure_file, chains)
+        else:
+            load_pymol(structure_file, 'test')
+        dssp = run_dssp(structure_file.path, cache, data=structure_file.data)
+        # residue table and dihedrals of each chain, shared by the motifs of the chain
+        residues = {}
+        dihedrals = {}
+        for i in group:
+            print(pdb_id[i], chain_id[i], start_id[i], loop_type[i])
+            if chain_id[i] not in residues:
+                if structure is None:
+                    atoms = cmd.get_model('chain ' + chain_id[i])
+                else:
+                    atoms = structure.chain_atoms(chain_id[i]).get_model()
+                residues[chain_id[i]] = residue_table(atoms)
+                dihedrals[chain_id[i]] = chain_dihedrals(atoms)
+            table = residues[chain_id[i]]
+            angles = dihedrals[chain_id[i]]
+            # sequential position of the motif start; the windows are
+            # taken by position, so insertion codes and odd numbering are fine
+            p = start_position(table, start_id[i])
+            sequence, secondary_structure, phi_psi = annotate_motif(records[i], table, angles, dssp, chain_id[i], p, **windows)
+            rows[i] = csv_cells([pdb_id[i], chain_id[i], start_id[i], loop_type[i], surface[i], sequence, secondary_structure, phi_psi])
+            #print(rows[i])
+        journal.record({key(i): {'row': rows[i], 'motif': motif_store.as_dict(records[i])} for i in group if i in rows})
+    journal.close()
+    data = pd.DataFrame([rows[i] for i in sorted(rows)])
+    data.to_csv(output + '.csv')
+    motif_store.save(output + '.npy', records[sorted(rows)])
+
+
+def parse_args(family, argv=None):
+    """ command line of get_seq_sec_dihed_<family>.py """
+    parser = argparse.ArgumentParser(description='sequence, secondary structure and dihedrals of {} motifs'.format(family))
+    parser.add_argument('PDB_path', help='folder with <pdb id>.pdb, .cif or .bcif files (optionally .gz), or a divided mirror (xy/pdb1xyz.ent.gz)')
+    parser.add_argument('csv_path', help='output of search_{}.py, without .csv, or its .npy motif store'.format(family))
+    parser.add_argument('output', help='output file name, without .csv')
+    parser.add_argument('--dssp-cache', default=DEFAULT_CACHE_DIR, help='DSSP cache folder (default %(default)s)')
+    parser.add_argument('--dssp-cache-size', type=int, default=2048, help='DSSP cache size limit in MB (default 2048)')
+    parser.add_argument('--no-dssp-cache', dest='dssp_cache', action='store_const', const=None, help='always run mkdssp')
+    parser.add_argument('--resume', action='store_true', help='skip the motifs already in <output>.journal.jsonl')
+    parser.add_argument('--backend', choices=['pymol', 'numpy'], default='pymol', help='structure handling with PyMOL (default) or the PyMOL-free NumPy loader')
+    parser.add_argument('--prefetch', type=int, default=4, help='structure files read ahead in background threads (default 4, 0 for none)')
+    parser.add_argument('--store', help='coordinate store compiled from PDB_path by coord_store.py, read with the NumPy backend; the files are still read for DSSP')
+    return parser.parse_args(argv)
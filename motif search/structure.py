@@ -0,0 +1,854 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import io
+import os
+import re
+import gzip
+import shlex
+import collections
+import numpy as np
+from scipy.spatial import cKDTree
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# residue names PyMOL's 'solvent' selects
+SOLVENT = ('HOH', 'WAT', 'H2O', 'DOD', 'D2O', 'TIP', 'TIP3', 'SOL')
+# backbone atoms that make a HETATM residue part of the polymer (e.g. MSE)
+AMINO_ACID_BACKBONE = ('N', 'CA', 'C')
+NUCLEOTIDE_BACKBONE = ('P', "O5'", "C5'")
+# N-H bond length used for the placed amide hydrogens (A)
+NH_BOND = 1.01
+# C-H bond length of the hydrogens h_add adds (A)
+CH_BOND = 1.09
+# longest C(i-1)-N distance still taken as a peptide bond (A)
+PEPTIDE_BOND = 2.0
+
+# X-H bond lengths cmd.h_add uses, by element of X (A)
+H_BOND = {'C': CH_BOND, 'N': NH_BOND, 'O': 0.96, 'S': 1.34}
+# covalent radii for the bonds between atoms: bonded if closer than the sum + BOND_TOLERANCE (A)
+COVALENT_RADII = {'H': 0.31, 'C': 0.76, 'N': 0.71, 'O': 0.66, 'S': 1.05, 'SE': 1.20, 'P': 1.07}
+BOND_TOLERANCE = 0.4
+# bonds h_add fills an atom up to, by element, and the atoms of the standard
+# amino acids that take fewer or more (carbonyl/carboxylate O, His ND1, Lys NZ)
+VALENCE = {'C': 4, 'N': 3, 'O': 2, 'S': 2, 'SE': 2}
+VALENCE_EXCEPTIONS = {'O': 1, 'OXT': 1, 'ASN OD1': 1, 'ASP OD1': 1, 'ASP OD2': 1, 'GLN OE1': 1,
+                      'GLU OE1': 1, 'GLU OE2': 1, 'HIS ND1': 2, 'LYS NZ': 4}
+# planar (sp2) carbons besides the backbone C, which have three bonds; an N bonded to one is planar too
+SP2_CARBONS = {
+    'ARG': ('CZ',), 'ASN': ('CG',), 'ASP': ('CG',), 'GLN': ('CD',), 'GLU': ('CD',),
+    'HIS': ('CG', 'CD2', 'CE1'),
+    'PHE': ('CG', 'CD1', 'CD2', 'CE1', 'CE2', 'CZ'),
+    'TRP': ('CG', 'CD1', 'CD2', 'CE2', 'CE3', 'CZ2', 'CZ3', 'CH2'),
+    'TYR': ('CG', 'CD1', 'CD2', 'CE1', 'CE2', 'CZ'),
+}
+
+# one row per residue of a chain model, see residue_table
+RESIDUE = np.dtype([('resi', 'U8'), ('resv', int), ('icode', 'U3'), ('resn', 'U5'), ('atoms', int),
+                    ('first', int), ('end', int), ('bonded', bool)])
+
+# per-residue dihedrals of a chain model, see chain_dihedrals
+DIHEDRALS = np.dtype([('phi', float), ('psi', float), ('omega', float), ('chi1', float), ('chi2', float), ('ca', int)])
+# side-chain atoms of chi1 and chi2
+CHI_ATOMS = {
+    'ARG': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD')],
+    'ASN': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'OD1')],
+    'ASP': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'OD1')],
+    'CYS': [('N', 'CA', 'CB', 'SG')],
+    'GLN': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD')],
+    'GLU': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD')],
+    'HIS': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'ND1')],
+    'ILE': [('N', 'CA', 'CB', 'CG1'), ('CA', 'CB', 'CG1', 'CD1')],
+    'LEU': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD1')],
+    'LYS': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD')],
+    'MET': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'SD')],
+    'PHE': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD1')],
+    'PRO': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD')],
+    'SER': [('N', 'CA', 'CB', 'OG')],
+    'THR': [('N', 'CA', 'CB', 'OG1')],
+    'TRP': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD1')],
+    'TYR': [('N', 'CA', 'CB', 'CG'), ('CA', 'CB', 'CG', 'CD1')],
+    'VAL': [('N', 'CA', 'CB', 'CG1')],
+}
+
+Atom = collections.namedtuple('Atom', ['index', 'name', 'alt', 'resn', 'chain', 'resi', 'segi', 'symbol', 'coord'])
+
+
+class Model:
+    """ atom list with the fields of a chempy model from cmd.get_model """
+
+    def __init__(self, atom):
+        self.atom = atom
+
+
+class Structure:
+    """
+    Structure -- atoms of a PDB/mmCIF/BinaryCIF file as parallel NumPy arrays, the
+    PyMOL-free backend of the search, dihedral and hydrophobic stages.
+
+    Offers the operations the scripts used PyMOL for: load (first model),
+    removal of solvent/ions/organics and hydrogens, per-chain atom arrays
+    and placement of the backbone amide hydrogens. Alternate locations are
+    kept as separate atoms, as PyMOL does, so lookups of an atom with
+    altlocs stay ambiguous in both backends.
+
+    index is the 1-based atom index within the object: it survives
+    chain_atoms() and take(), and is renumbered by remove(), like cmd.index
+    after cmd.remove. Atoms are kept in file order, so unlike PyMOL's
+    (sorted) object the index follows the file. The readers number the
+    atoms of the whole first model, also when only some chains are read.
+    """
+
+    FIELDS = ('het', 'name', 'alt', 'resn', 'chain', 'resi', 'resv', 'icode', 'segi', 'element', 'coord', 'index')
+
+    def __init__(self, het, name, alt, resn, chain, resi, resv, icode, segi, element, coord, index=None):
+        self.het = het
+        self.name = name
+        self.alt = alt
+        self.resn = resn
+        self.chain = chain
+        self.resi = resi
+        self.resv = resv
+        self.icode = icode
+        self.segi = segi
+        self.element = element
+        self.coord = coord
+        self.index = np.arange(1, len(name) + 1) if index is None else index
+
+    def __len__(self):
+        return len(self.name)
+
+    def take(self, rows):
+        """ the atoms in rows (mask or indices), keeping their index """
+        return Structure(**{f: getattr(self, f)[rows] for f in self.FIELDS})
+
+    def remove(self, rows):
+        """
+        the structure without the atoms in rows (mask), renumbered like
+        cmd.remove: each atom moves down by the atoms removed before it
+        """
+        keep = np.ones(len(self), dtype=bool)
+        keep[rows] = False
+        fields = {f: getattr(self, f)[keep] for f in self.FIELDS}
+        fields['index'] = fields['index'] - np.cumsum(~keep)[keep]
+        return Structure(**fields)
+
+    def residue_ids(self):
+        """ residue number of every atom: a new residue starts wherever chain, segi or resi changes """
+        new = np.ones(len(self), dtype=bool)
+        new[1:] = (self.chain[1:] != self.chain[:-1]) | (self.segi[1:] != self.segi[:-1]) | (self.resi[1:] != self.resi[:-1])
+        return np.cumsum(new) - 1
+
+    def residue_atom(self, name):
+        """ row of the first atom called name in every residue, -1 where there is none """
+        res = self.residue_ids()
+        out = np.full(res[-1] + 1 if len(res) else 0, -1, dtype=int)
+        rows = np.nonzero(self.name == name)[0][::-1]
+        out[res[rows]] = rows
+        return out
+
+    def strip(self):
+        """ remove solvent, ions and organic ligands ('solvent', 'ino.', 'org.'), keeping the polymer """
+        res = self.residue_ids()
+        polymer = ~self.het
+        for backbone in (AMINO_ACID_BACKBONE, NUCLEOTIDE_BACKBONE):
+            complete = np.ones(res[-1] + 1 if len(res) else 0, dtype=bool)
+            for name in backbone:
+                found = np.zeros_like(complete)
+                found[res[self.name == name]] = True
+                complete &= found
+            polymer |= complete[res]
+        polymer &= ~np.isin(self.resn, SOLVENT)
+        return self.remove(~polymer)
+
+    def hydrogens(self):
+        return np.isin(self.element, ('H', 'D'))
+
+    def remove_hydrogens(self):
+        return self.remove(self.hydrogens())
+
+    def chains(self):
+        """ chain ids in the structure, as cmd.get_chains """
+        return sorted(set(self.chain))
+
+    def chain_atoms(self, chain_id):
+        return self.take(self.chain == chain_id)
+
+    def get_model(self):
+        # plain Python values, as in a chempy model
+        fields = [getattr(self, f).tolist() for f in ('index', 'name', 'alt', 'resn', 'chain', 'resi', 'segi', 'element', 'coord')]
+        return Model([Atom(*values) for values in zip(*fields)])
+
+    def add_amide_hydrogens(self):
+        """
+        the structure with a backbone N-H added to every residue whose N is
+        peptide-bonded to the C of the residue before it, unless the residue
+        is a proline, its N already carries a hydrogen in the file, or h_add
+        would put another hydrogen of the residue within 2 A of N
+        (crowded_amides).
+
+        See amide_hydrogen_positions. N-termini and chain breaks get none
+        (h_add would add two or three, which the H-bond tests treat as
+        ambiguous all the same).
+        """
+        res = self.residue_ids()
+        if len(res) == 0:
+            return self
+        n, ca, c = self.residue_atom('N'), self.residue_atom('CA'), self.residue_atom('C')
+        c_prev = np.full(len(c), -1)
+        c_prev[1:] = c[:-1]
+        same_chain = np.zeros(len(c), dtype=bool)
+        first = np.nonzero(np.r_[True, res[1:] != res[:-1]])[0]
+        same_chain[1:] = self.chain[first[1:]] == self.chain[first[:-1]]
+        ok = (n >= 0) & (ca >= 0) & (c >= 0) & (c_prev >= 0) & same_chain & (self.resn[first] != 'PRO') & ~crowded_amides(self)
+        # residues whose N already has a hydrogen within 2 A
+        h_rows = np.nonzero(self.hydrogens())[0]
+        h_rows = h_rows[n[res[h_rows]] >= 0]
+        near = np.linalg.norm(self.coord[h_rows] - self.coord[n[res[h_rows]]], axis=1) <= 2.0
+        ok[res[h_rows[near]]] = False
+        rows = np.nonzero(ok)[0]
+        n_xyz, ca_xyz, c_xyz = self.coord[n[rows]], self.coord[ca[rows]], self.coord[c_prev[rows]]
+        bonded = np.linalg.norm(n_xyz - c_xyz, axis=1) < PEPTIDE_BOND
+        rows, n_xyz, ca_xyz, c_xyz = rows[bonded], n_xyz[bonded], ca_xyz[bonded], c_xyz[bonded]
+        h_xyz = amide_hydrogen_positions(n_xyz, ca_xyz, c_xyz)
+        atoms = first[rows]
+        count = len(rows)
+        added = Structure(het=self.het[atoms], name=np.full(count, 'H', dtype=self.name.dtype),
+                          alt=np.full(count, '', dtype=self.alt.dtype), resn=self.resn[atoms],
+                          chain=self.chain[atoms], resi=self.resi[atoms], resv=self.resv[atoms],
+                          icode=self.icode[atoms], segi=self.segi[atoms],
+                          element=np.full(count, 'H', dtype=self.element.dtype), coord=h_xyz,
+                          index=self._next_index(count))
+        return concatenate([self, added])
+
+    def add_hydrogens(self):
+        """
+        the structure with the hydrogens cmd.h_add adds: every heavy atom is
+        filled up to its valence (VALENCE, VALENCE_EXCEPTIONS), tetrahedrally
+        or in the plane of the planar atoms (SP2_CARBONS, and N bonded to
+        them), at H_BOND. Hydrogens already there, from the file or
+        add_amide_hydrogens, are kept and count as bonds.
+
+        Bonds are found by distance (covalent_bonds). The standard amino
+        acids get h_add's hydrogens to within float precision; other residues
+        get the usual valence of each element and tetrahedral geometry.
+        """
+        parent, h_xyz = self.missing_hydrogens()
+        count = len(parent)
+        if count == 0:
+            return self
+        added = Structure(het=self.het[parent], name=np.full(count, 'H', dtype=self.name.dtype),
+                          alt=self.alt[parent], resn=self.resn[parent], chain=self.chain[parent],
+                          resi=self.resi[parent], resv=self.resv[parent], icode=self.icode[parent],
+                          segi=self.segi[parent], element=np.full(count, 'H', dtype=self.element.dtype),
+                          coord=h_xyz.astype(self.coord.dtype), index=self._next_index(count))
+        return concatenate([self, added])
+
+    def _next_index(self, count):
+        """ index of count atoms added after the last one """
+        last = self.index.max() if len(self) else 0
+        return np.arange(last + 1, last + count + 1)
+
+    def missing_hydrogens(self):
+        """ (parent row, coordinates) of every hydrogen add_hydrogens adds """
+        if len(self) == 0:
+            return np.zeros(0, dtype=int), np.zeros((0, 3))
+        neighbors = covalent_bonds(self)
+        degree = (neighbors >= 0).sum(axis=1)
+        key = np.char.add(np.char.add(self.resn.astype(str), ' '), self.name.astype(str))
+        sp2 = (self.name == 'C') & (self.element == 'C')
+        for resn, names in SP2_CARBONS.items():
+            sp2 |= (self.resn == resn) & np.isin(self.name, names)
+        valence = np.array([VALENCE_EXCEPTIONS.get(k, VALENCE_EXCEPTIONS.get(n, VALENCE.get(e, 0)))
+                            for k, n, e in zip(key.tolist(), self.name.tolist(), self.element.tolist())], dtype=int)
+        valence[sp2] = 3
+        padded = np.r_[sp2, False]
+        planar = sp2 | ((self.element == 'N') & padded[neighbors].any(axis=1))
+        length = np.array([H_BOND.get(e, 0.0) for e in self.element.tolist()])
+        missing = np.where(self.hydrogens() | (length == 0) | (degree == 0), 0, np.clip(valence - degree, 0, None))
+        return hydrogen_positions(self.coord, neighbors, missing, planar, length)
+
+
+def split_resi(resi):
+    """ (residue number, insertion code) of a resi such as '52', '52A' or '-3' """
+    match = re.match(r'\s*(-?\d+)(.*)', resi)
+    if match is None:
+        return 0, resi.strip()
+    return int(match.group(1)), match.group(2).strip()
+
+
+def _residue_rows(resi):
+    """ residue ids in order of first appearance, with first atom, atom count, last atom, and the residue row of every atom """
+    keys, first, inverse, count = np.unique(resi, return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    last = np.zeros(len(keys), dtype=int)
+    np.maximum.at(last, inverse, np.arange(len(resi)))
+    order = np.argsort(first)
+    row = np.empty(len(keys), dtype=int)
+    row[order] = np.arange(len(keys))
+    return keys[order], first[order], count[order], last[order], row[inverse]
+
+
+def _first_atoms(row, name, atom_name, count):
+    """ atom row of the first atom called atom_name of each of count residues, -1 where there is none """
+    out = np.full(count, -1, dtype=int)
+    rows = np.nonzero(name == atom_name)[0][::-1]
+    out[row[rows]] = rows
+    return out
+
+
+def _model_arrays(model):
+    resi = np.array([at.resi for at in model.atom], dtype='U8')
+    name = np.array([at.name for at in model.atom], dtype='U4')
+    coord = np.array([at.coord for at in model.atom], dtype=float).reshape(-1, 3)
+    return resi, name, coord
+
+
+def residue_table(model):
+    """
+    residue_table -- the residues of a chain model (cmd.get_model or
+    Structure.get_model) as a RESIDUE array, built in one pass over the atoms.
+    Rows are the sequential positions of the residues, in model order, with
+    their resi, its number and insertion code (split_resi), resn of the first
+    atom, atom count, the rows first to end (exclusive) of model.atom the
+    residue spans, and bonded: True where the residue's N is peptide-bonded
+    to the C of the row before (chain continuity, whatever the numbering).
+    """
+    resi, name, coord = _model_arrays(model)
+    resn = np.array([at.resn for at in model.atom], dtype='U5')
+    keys, first, count, last, row = _residue_rows(resi)
+    table = np.zeros(len(keys), dtype=RESIDUE)
+    table['resi'] = keys
+    table['resv'], table['icode'] = zip(*[split_resi(r) for r in keys]) if len(keys) else ([], [])
+    table['resn'] = resn[first]
+    table['atoms'] = count
+    table['first'] = first
+    table['end'] = last + 1
+    n, c_prev = _first_atoms(row, name, 'N', len(keys))[1:], _first_atoms(row, name, 'C', len(keys))[:-1]
+    ok = (n >= 0) & (c_prev >= 0)
+    table['bonded'][1:] = ok & (np.linalg.norm(coord[np.where(ok, n, 0)] - coord[np.where(ok, c_prev, 0)], axis=1) < PEPTIDE_BOND)
+    return table
+
+
+def chain_dihedrals(model):
+    """
+    chain_dihedrals -- backbone and side-chain dihedrals (degrees) of every
+    residue of a chain model in one NumPy pass, a DIHEDRALS array aligned
+    with the rows of residue_table(model); nan where an angle is undefined.
+
+    phi and psi are given, as by cmd.phi_psi, only where the residue is
+    peptide-bonded on both sides; omega is CA(i-1)-C(i-1)-N-CA; chi1/chi2
+    follow CHI_ATOMS. ca is the index (at.index) of the residue's CA, -1 if
+    it has none. The first atom of each name is used (first altloc).
+    """
+    resi, name, coord = _model_arrays(model)
+    keys, first, count, last, row = _residue_rows(resi)
+    k = len(keys)
+    out = np.zeros(k, dtype=DIHEDRALS)
+    for angle in ('phi', 'psi', 'omega', 'chi1', 'chi2'):
+        out[angle] = np.nan
+    out['ca'] = -1
+    if k == 0:
+        return out
+    atom = {a: _first_atoms(row, name, a, k) for a in ('N', 'CA', 'C')}
+    n, ca, c = atom['N'], atom['CA'], atom['C']
+    index = np.array([at.index for at in model.atom], dtype=int)
+    out['ca'] = np.where(ca >= 0, index[ca], -1)
+    # peptide bond between residue j-1 and j, for j >= 1
+    bonded = np.zeros(k, dtype=bool)
+    ok = (n[1:] >= 0) & (c[:-1] >= 0)
+    bonded[1:] = ok & (np.linalg.norm(coord[np.where(ok, n[1:], 0)] - coord[np.where(ok, c[:-1], 0)], axis=1) < PEPTIDE_BOND)
+    backbone = (n >= 0) & (ca >= 0) & (c >= 0)
+    after = np.zeros(k, dtype=bool)
+    after[:-1] = bonded[1:]
+    both = np.nonzero(backbone & bonded & after)[0]
+    out['phi'][both] = dihedral(coord[c[both - 1]], coord[n[both]], coord[ca[both]], coord[c[both]])
+    out['psi'][both] = dihedral(coord[n[both]], coord[ca[both]], coord[c[both]], coord[n[both + 1]])
+    j = np.nonzero(bonded & (ca >= 0) & (np.roll(ca, 1) >= 0))[0]
+    out['omega'][j] = dihedral(coord[ca[j - 1]], coord[c[j - 1]], coord[n[j]], coord[ca[j]])
+    # side-chain dihedrals, one batch per residue type
+    resn = np.array([model.atom[f].resn for f in first], dtype='U5')
+    for resname, chis in CHI_ATOMS.items():
+        rows = np.nonzero(resn == resname)[0]
+        if len(rows) == 0:
+            continue
+        for angle, names in zip(('chi1', 'chi2'), chis):
+            atoms = np.array([_first_atoms(row, name, a, k)[rows] for a in names])
+            found = (atoms >= 0).all(axis=0)
+            p = atoms[:, found]
+            out[angle][rows[found]] = dihedral(coord[p[0]], coord[p[1]], coord[p[2]], coord[p[3]])
+    return out
+
+
+def concatenate(structures):
+    return Structure(**{f: np.concatenate([getattr(s, f) for s in structures]) for f in Structure.FIELDS})
+
+
+def _unit(v):
+    return v / np.linalg.norm(v, axis=1)[:, None]
+
+
+def amide_hydrogen_positions(n, ca, c_prev):
+    """
+    backbone N-H positions from (k, 3) arrays of N, CA and preceding C
+    coordinates: in the C(i-1)-N-CA plane on the outer bisector of the two
+    bonds, NH_BOND from N, where cmd.h_add puts them
+    """
+    return n + NH_BOND * _unit(_unit(n - c_prev) + _unit(n - ca))
+
+
+def crowded_amides(structure):
+    """
+    True for every residue (residue_ids) where cmd.h_add puts a second
+    hydrogen of the residue, alpha or side-chain, within 2 A of its N:
+    'h. within 2 of n. N' then finds two hydrogens, and the residue has no
+    usable amide H in the original H-bond tests either
+    """
+    res = structure.residue_ids()
+    if len(res) == 0:
+        return np.zeros(0, dtype=bool)
+    n = structure.residue_atom('N')
+    parent, h_xyz = structure.missing_hydrogens()
+    h_rows = np.nonzero(structure.hydrogens())[0]
+    h_res = np.r_[res[parent], res[h_rows]]
+    h_xyz = np.concatenate([h_xyz, structure.coord[h_rows]])
+    has_n = n[h_res] >= 0
+    h_res, h_xyz = h_res[has_n], h_xyz[has_n]
+    near = np.linalg.norm(h_xyz - structure.coord[n[h_res]], axis=1) <= 2.0
+    return np.bincount(h_res[near], minlength=len(n)) >= 2
+
+
+def model_structure(model):
+    """ Structure of the atoms of a chempy model (cmd.get_model) or of Structure.get_model """
+    atoms = model.atom
+    resi = [str(a.resi) for a in atoms]
+    number = [split_resi(r) for r in resi]
+    return Structure(het=np.array([getattr(a, 'hetatm', 0) == 1 for a in atoms], dtype=bool),
+                     name=np.array([a.name for a in atoms], dtype=str), alt=np.array([a.alt for a in atoms], dtype=str),
+                     resn=np.array([a.resn for a in atoms], dtype=str), chain=np.array([a.chain for a in atoms], dtype=str),
+                     resi=np.array(resi, dtype=str), resv=np.array([v for v, i in number], dtype=int),
+                     icode=np.array([i for v, i in number], dtype=str), segi=np.array([a.segi for a in atoms], dtype=str),
+                     element=np.array([a.symbol.upper() for a in atoms], dtype=str),
+                     coord=np.array([a.coord for a in atoms], dtype=float).reshape(-1, 3),
+                     index=np.array([a.index for a in atoms], dtype=int))
+
+
+def covalent_bonds(structure):
+    """
+    (n, 4) rows of the atoms bonded to each atom, padded with -1: atoms
+    closer than the sum of their COVALENT_RADII + BOND_TOLERANCE, unless
+    they sit in different alternate locations. Heavy atoms come first, each
+    group in file order, as in PyMOL's sorted object.
+    """
+    radii = np.array([COVALENT_RADII.get(e, 1.5) for e in structure.element.tolist()])
+    tree = cKDTree(structure.coord)
+    pairs = tree.query_pairs(2 * radii.max() + BOND_TOLERANCE, output_type='ndarray')
+    i, j = pairs[:, 0], pairs[:, 1]
+    d = np.linalg.norm(structure.coord[i] - structure.coord[j], axis=1)
+    alt_i, alt_j = structure.alt[i], structure.alt[j]
+    bonded = (d < radii[i] + radii[j] + BOND_TOLERANCE) & ((alt_i == alt_j) | (alt_i == '') | (alt_j == ''))
+    i, j = np.r_[i[bonded], j[bonded]], np.r_[j[bonded], i[bonded]]
+    order = np.lexsort((j, structure.hydrogens()[j], i))
+    i, j = i[order], j[order]
+    # position of each bond among the bonds of its atom
+    slot = np.arange(len(i)) - np.searchsorted(i, i)
+    neighbors = np.full((len(structure), 4), -1)
+    keep = slot < 4
+    neighbors[i[keep], slot[keep]] = j[keep]
+    return neighbors
+
+
+def hydrogen_positions(coord, neighbors, missing, planar, length):
+    """
+    missing[k] hydrogens on each atom k at length[k], one after the other as
+    cmd.h_add places them, every new hydrogen counting as a bond for the
+    next, from the unit bond vectors b1, b2, ... of the atom (covalent_bonds order):
+        three bonds     opposite their sum
+        two bonds       on the outer bisector t (planar), or at
+                        t -/+ 1.41 x unit(b1 x b2), normalised (tetrahedral;
+                        + when b2 is a hydrogen placed here)
+        one bond        at -0.334 b1 + 0.943 z, normalised (tetrahedral;
+                        z normal to b1 as PyMOL's get_system1f3f builds it),
+                        or at 120 degrees in the plane of the bonded atom
+                        and its first two other neighbours (planar)
+    Returns the parent row and the coordinates of every new hydrogen.
+    """
+    rows = np.nonzero(missing > 0)[0]
+    if len(rows) == 0:
+        return rows, np.zeros((0, 3))
+    center = coord[rows]
+    count = (neighbors[rows] >= 0).sum(axis=1)
+    bonded = count.copy()
+    bonds = np.zeros((len(rows), 4, 3))
+    present = neighbors[rows] >= 0
+    bonds[present] = _unit(coord[neighbors[rows][present]] - np.repeat(center, count, axis=0))
+    parent, placed = [], []
+    for step in range(missing.max()):
+        todo = np.nonzero(missing[rows] > step)[0]
+        n, flat = count[todo], planar[rows[todo]]
+        b = bonds[todo]
+        d = np.zeros((len(todo), 3))
+        three = n == 3
+        d[three] = -_unit(b[three, 0] + b[three, 1] + b[three, 2])
+        two = n == 2
+        t = -_unit(b[two, 0] + b[two, 1])
+        # h_add turns the other way when the second bond is one of its own hydrogens
+        side = np.where(bonded[todo][two] == 1, 1.41, -1.41)
+        bent = _unit(t + side[:, None] * _unit(np.cross(b[two, 0], b[two, 1])))
+        d[two] = np.where(flat[two][:, None], t, bent)
+        one = np.nonzero(n == 1)[0]
+        if len(one):
+            v = b[one, 0]
+            # get_system1f3f: z normal to v and to (-v0, v1 + 0.1, v2)
+            z = _unit(np.cross(v, v * [-1, 1, 1] + [0, 0.1, 0]))
+            d[one] = _unit(-0.334 * v + 0.943 * z)
+            sp2 = one[flat[one]]
+            if len(sp2):
+                d[sp2] = _planar_hydrogens(coord, neighbors, rows[todo[sp2]], b[sp2, 0], z[flat[one]])
+        bonds[todo, n] = d
+        count[todo] += 1
+        parent.append(rows[todo])
+        placed.append(center[todo] + length[rows[todo]][:, None] * d)
+    return np.concatenate(parent), np.concatenate(placed)
+
+
+def _planar_hydrogens(coord, neighbors, rows, v, z):
+    """ first hydrogen of planar atoms with one bond v: 120 degrees from it, in the plane of the bonded atom's other bonds """
+    bonded = neighbors[rows, 0]
+    others = neighbors[bonded]
+    others = np.where(others == rows[:, None], -1, others)
+    # first two other neighbours of the bonded atom, in file order
+    first = np.argsort(others < 0, axis=1, kind='stable')[:, :2]
+    z1, z2 = np.take_along_axis(others, first, axis=1).T
+    w = np.where((z1 >= 0)[:, None], _unit(coord[z1] - coord[bonded]), 0.0)
+    w -= np.where((z2 >= 0)[:, None], _unit(coord[z2] - coord[bonded]), 0.0)
+    w -= np.sum(w * v, axis=1)[:, None] * v
+    # a bonded atom without other neighbours leaves the plane free
+    w = np.where((np.linalg.norm(w, axis=1) > 1e-6)[:, None], w, z)
+    return _unit(-0.5 * v + 0.866 * _unit(w))
+
+
+def dihedral(p0, p1, p2, p3):
+    """ dihedral angles (degrees) of arrays of four points, as cmd.get_dihedral """
+    b0, b1, b2 = p0 - p1, p2 - p1, p3 - p2
+    b1 = _unit(b1)
+    v = b0 - np.sum(b0 * b1, axis=1)[:, None] * b1
+    w = b2 - np.sum(b2 * b1, axis=1)[:, None] * b1
+    x = np.sum(v * w, axis=1)
+    y = np.sum(np.cross(b1, v) * w, axis=1)
+    return np.degrees(np.arctan2(y, x))
+
+
+def phi_psi(structure, chain_id, first, last, object_name='test', resi=None):
+    """
+    phi/psi of the residues of chain_id numbered first to last, as returned
+    by cmd.phi_psi('<object> & c. <chain> & i. first-last'): a dict
+    (object, CA index) -> (phi, psi) for the residues with both angles.
+    resi: a list of residue ids ('52', '52A') to take instead of first-last.
+    """
+    res = structure.residue_ids()
+    if len(res) == 0:
+        return {}
+    n, ca, c = structure.residue_atom('N'), structure.residue_atom('CA'), structure.residue_atom('C')
+    start = np.nonzero(np.r_[True, res[1:] != res[:-1]])[0]
+    chain = structure.chain[start]
+    resv = structure.resv[start]
+    selected = (resv >= first) & (resv <= last) if resi is None else np.isin(structure.resi[start], resi)
+    k = np.nonzero((chain == chain_id) & selected & (n >= 0) & (ca >= 0) & (c >= 0))[0]
+    k = k[(k > 0) & (k < len(start) - 1)]
+    k = k[(chain[k - 1] == chain_id) & (chain[k + 1] == chain_id) & (c[k - 1] >= 0) & (n[k + 1] >= 0)]
+    xyz = structure.coord
+    # both neighbours must be peptide-bonded
+    k = k[(np.linalg.norm(xyz[c[k - 1]] - xyz[n[k]], axis=1) < PEPTIDE_BOND) &
+          (np.linalg.norm(xyz[c[k]] - xyz[n[k + 1]], axis=1) < PEPTIDE_BOND)]
+    phi = dihedral(xyz[c[k - 1]], xyz[n[k]], xyz[ca[k]], xyz[c[k]])
+    psi = dihedral(xyz[n[k]], xyz[ca[k]], xyz[c[k]], xyz[n[k + 1]])
+    return {(object_name, int(structure.index[ca[j]])): (float(f), float(s)) for j, f, s in zip(k, phi, psi)}
+
+
+# file names tried for a PDB id, in this order
+STRUCTURE_FORMATS = ('.pdb', '.ent', '.cif', '.bcif', '.pdb.gz', '.ent.gz', '.cif.gz', '.bcif.gz')
+# file names in the divided layout of the wwPDB mirrors, under the middle two
+# characters of the (lower case) id, e.g. xy/pdb1xyz.ent.gz or xy/1xyz.cif.gz
+DIVIDED_FORMATS = ('pdb{}.ent.gz', 'pdb{}.ent', '{}.cif.gz', '{}.cif', '{}.bcif.gz', '{}.bcif')
+
+# BinaryCIF ByteArray type codes
+BCIF_TYPES = {1: '<i1', 2: '<i2', 3: '<i4', 4: '<u1', 5: '<u2', 6: '<u4', 32: '<f4', 33: '<f8'}
+
+# _atom_site columns read from mmCIF/BinaryCIF, alternatives in order of preference
+ATOM_SITE = {'group_PDB': ('group_PDB',), 'name': ('auth_atom_id', 'label_atom_id'), 'alt': ('label_alt_id',),
+             'resn': ('auth_comp_id', 'label_comp_id'), 'chain': ('auth_asym_id', 'label_asym_id'),
+             'resseq': ('auth_seq_id', 'label_seq_id'), 'icode': ('pdbx_PDB_ins_code',), 'segi': ('label_asym_id',),
+             'element': ('type_symbol',), 'x': ('Cartn_x',), 'y': ('Cartn_y',), 'z': ('Cartn_z',),
+             'model': ('pdbx_PDB_model_num',)}
+
+
+def find_structure(folder, pdb_id):
+    """
+    path of the file of pdb_id in folder, flat (<id> + any of
+    STRUCTURE_FORMATS) or divided (DIVIDED_FORMATS), None if there is none
+    """
+    for ext in STRUCTURE_FORMATS:
+        path = os.path.join(folder, pdb_id + ext)
+        if os.path.isfile(path):
+            return path
+    pdb_id = pdb_id.lower()
+    for name in DIVIDED_FORMATS:
+        path = os.path.join(folder, pdb_id[1:3], name.format(pdb_id))
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def is_mmcif(path):
+    return path.endswith(('.cif', '.cif.gz', '.mmcif', '.mmcif.gz'))
+
+
+def is_bcif(path):
+    return path.endswith(('.bcif', '.bcif.gz'))
+
+
+def _open(path, data=None):
+    """ binary file of path, or of data when its content (decompressed) is already in memory """
+    if data is not None:
+        return io.BytesIO(data)
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _element(name, element):
+    """ element symbol from the element column, or from the atom name when that is blank or not an element """
+    element = np.char.upper(element)
+    guess = np.char.upper(np.char.lstrip(name, '0123456789'))
+    guess = np.array([g[:1] for g in guess], dtype='U2') if len(guess) else guess.astype('U2')
+    return np.where(np.char.isalpha(element), element, guess)
+
+
+def _fields(het, name, alt, resn, chain, resseq, icode, segi, element, coord, index=None):
+    resseq = np.char.strip(resseq)
+    return Structure(het=het, name=name, alt=alt, resn=resn, chain=chain,
+                     resi=np.char.add(resseq, icode), resv=np.array([int(r) if r else 0 for r in resseq], dtype=int),
+                     icode=icode, segi=segi, element=_element(name, element), coord=coord, index=index)
+
+
+def read_pdb(path, chains=None, data=None):
+    """
+    ATOM/HETATM records of the first model of a PDB file (optionally .gz),
+    or of data, its content; with chains (chain ids), only the records of
+    those chains are kept, with the index they have in the whole file
+    """
+    lines = []
+    index = []
+    n = 1
+    keep = None if chains is None else {c.encode() for c in chains}
+    with _open(path, data) as f:
+        for line in f:
+            if line.startswith((b'ATOM  ', b'HETATM')):
+                if keep is None or line[21:22].strip() in keep:
+                    lines.append(line.rstrip(b'\r\n'))
+                    index.append(n)
+                n += 1
+            elif line.startswith(b'ENDMDL'):
+                break
+    # fixed-width columns sliced out of one (atoms x 80) byte array
+    chars = np.array(lines, dtype='S80').view('S1').reshape(-1, 80)
+
+    def column(a, b):
+        return np.char.strip(np.char.decode(np.ascontiguousarray(chars[:, a:b]).view('S%d' % (b - a)).ravel(), 'latin-1'))
+
+    coord = np.stack([np.ascontiguousarray(chars[:, a:a + 8]).view('S8').ravel().astype(float)
+                      for a in (30, 38, 46)], axis=1) if len(lines) else np.zeros((0, 3))
+    return _fields(het=column(0, 6) == 'HETATM', name=column(12, 16), alt=column(16, 17),
+                   resn=column(17, 20), chain=column(21, 22), resseq=column(22, 26), icode=column(26, 27),
+                   segi=column(72, 76), element=column(76, 78), coord=coord, index=np.array(index, dtype=int))
+
+
+def _atom_site(columns, n, index=None):
+    """
+    Structure of the _atom_site rows of the first model, from columns
+    (CIF item name -> values as str, '?' and '.' for missing) of n rows
+    and their index in the file (default 1 to n)
+    """
+    def field(key):
+        for name in ATOM_SITE[key]:
+            if name in columns:
+                values = np.asarray(columns[name], dtype=str) if n else np.zeros(0, dtype='U1')
+                return np.where(np.isin(values, ('?', '.')), '', values)
+        return np.full(n, '', dtype='U1')
+
+    model = field('model')
+    keep = model == model[0] if len(model) and model[0] != '' else np.ones(n, dtype=bool)
+    coord = np.stack([field(c).astype(float) for c in ('x', 'y', 'z')], axis=1) if n else np.zeros((0, 3))
+    s = _fields(het=field('group_PDB') == 'HETATM', name=field('name'), alt=field('alt'), resn=field('resn'),
+                chain=field('chain'), resseq=field('resseq'), icode=field('icode'), segi=field('segi'),
+                element=field('element'), coord=coord, index=index)
+    return s.take(keep)
+
+
+def read_mmcif(path, chains=None, data=None):
+    """
+    _atom_site rows of the first model of an mmCIF file (optionally .gz),
+    or of data, its content, with author numbering. The file is streamed:
+    with chains (author chain ids) only the rows of those chains are kept,
+    and reading stops at the end of the first model, so large assemblies
+    need little memory.
+    """
+    columns = []
+    rows = []
+    index = []
+    in_loop = False
+    chain = model = first_model = None
+    seen = False
+    count = 1
+    with _open(path, data) as f:
+        for line in f:
+            line = line.decode('latin-1').strip()
+            if line.startswith('_atom_site.'):
+                columns.append(line.split()[0][len('_atom_site.'):])
+                in_loop = True
+            elif in_loop and columns:
+                if line == '' or line.startswith(('#', 'loop_', '_')):
+                    if seen:
+                        break
+                    continue
+                seen = True
+                if chain is None:
+                    chain = next((columns.index(c) for c in ATOM_SITE['chain'] if c in columns), -1)
+                    model = columns.index('pdbx_PDB_model_num') if 'pdbx_PDB_model_num' in columns else -1
+                row = shlex.split(line) if '"' in line or "'" in line else line.split()
+                if model >= 0:
+                    if first_model is None:
+                        first_model = row[model]
+                    elif row[model] != first_model:
+                        break
+                # a missing chain id ('?' or '.') is the blank chain ''
+                if chains is None or chain < 0 or ('' if row[chain] in ('?', '.') else row[chain]) in chains:
+                    rows.append(row)
+                    index.append(count)
+                count += 1
+    return _atom_site({c: [r[n] for r in rows] for n, c in enumerate(columns)}, len(rows), np.array(index, dtype=int))
+
+
+def _bcif_decode(data, encoding):
+    """ values of a BinaryCIF column from its data and encoding list (decoded last to first) """
+    for e in reversed(encoding):
+        kind = e['kind']
+        if kind == 'ByteArray':
+            data = np.frombuffer(data, dtype=BCIF_TYPES[e['type']])
+        elif kind == 'FixedPoint':
+            data = (data / e['factor']).astype(BCIF_TYPES[e['srcType']])
+        elif kind == 'IntervalQuantization':
+            data = (e['min'] + (e['max'] - e['min']) / (e['numSteps'] - 1) * data).astype(BCIF_TYPES[e['srcType']])
+        elif kind == 'RunLength':
+            data = np.repeat(data[0::2], data[1::2]).astype(BCIF_TYPES[e['srcType']])
+        elif kind == 'Delta':
+            data = (e['origin'] + np.cumsum(data, dtype=np.int64)).astype(BCIF_TYPES[e['srcType']])
+        elif kind == 'IntegerPacking':
+            # a value is the sum of a run of the limit values and the one after them
+            limit = (1 << (8 * e['byteCount'] - (0 if e['isUnsigned'] else 1))) - 1
+            ends = np.nonzero((data != limit) & (e['isUnsigned'] | (data != -limit - 1)))[0]
+            starts = np.r_[0, ends[:-1] + 1]
+            data = np.add.reduceat(data.astype(np.int32), starts) if len(data) else data.astype(np.int32)
+        elif kind == 'StringArray':
+            offsets = _bcif_decode(e['offsets'], e['offsetEncoding'])
+            strings = [e['stringData'][a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            # index -1 (no string) becomes the last, empty entry
+            data = np.array(strings + [''], dtype=str)[_bcif_decode(data, e['dataEncoding'])]
+        else:
+            raise ValueError('unknown BinaryCIF encoding ' + kind)
+    return data
+
+
+def read_bcif(path, chains=None, data=None):
+    """
+    _atom_site rows of the first model of a BinaryCIF file (optionally .gz),
+    or of data, its content, with author numbering. Unlike read_mmcif this does not stream: the
+    whole file is read and unpacked in memory. Only the _atom_site columns
+    read here are decoded; with chains (author chain ids) the chain column
+    is decoded first and only the rows of those chains are kept.
+    Needs the msgpack package.
+    """
+    if msgpack is None:
+        raise ImportError('reading BinaryCIF files needs the msgpack package (pip install msgpack)')
+    with _open(path, data) as f:
+        block = msgpack.unpackb(f.read(), raw=False)['dataBlocks'][0]
+    category = next((c for c in block['categories'] if c['name'] == '_atom_site'), None)
+    if category is None:
+        return _atom_site({}, 0)
+    wanted = {name for names in ATOM_SITE.values() for name in names}
+    encoded = {c['name']: c for c in category['columns'] if c['name'] in wanted}
+
+    def decode(name):
+        column = encoded[name]
+        values = _bcif_decode(column['data']['data'], column['data']['encoding'])
+        if column.get('mask') is not None:
+            # mask 1: '.', 2: '?'
+            mask = _bcif_decode(column['mask']['data'], column['mask']['encoding'])
+            values = np.where(mask == 0, values.astype(str), np.where(mask == 1, '.', '?'))
+        return values
+
+    rows = slice(None)
+    index = None
+    if chains is not None:
+        chain = next((c for c in ATOM_SITE['chain'] if c in encoded), None)
+        if chain is not None:
+            values = decode(chain).astype(str)
+            rows = np.isin(np.where(np.isin(values, ('?', '.')), '', values), list(chains))
+            index = np.nonzero(rows)[0] + 1
+    columns = {name: decode(name)[rows].astype(str) for name in encoded}
+    n = len(next(iter(columns.values()))) if columns else 0
+    return _atom_site(columns, n, index)
+
+
+def load(path, chains=None, data=None):
+    """
+    Structure of a .pdb/.ent, .cif or .bcif file, gzipped or not; with
+    chains (chain ids), only the atoms of those chains are read. data: the
+    (decompressed) content of the file when it has been read already; the
+    format still follows path
+    """
+    if is_bcif(path):
+        return read_bcif(path, chains, data)
+    if is_mmcif(path):
+        return read_mmcif(path, chains, data)
+    return read_pdb(path, chains, data)
+
+
+def write_mmcif(structure, path):
+    """
+    minimal mmCIF (_atom_site only) of a structure, e.g. for mkdssp from a
+    BinaryCIF file, to path or to a text file object
+    """
+    if not isinstance(path, str):
+        _write_mmcif(structure, path)
+        return
+    with open(path, 'w') as f:
+        _write_mmcif(structure, f)
+
+
+def _write_mmcif(structure, f):
+    def value(v):
+        v = str(v)
+        if v == '':
+            return '?'
+        if "'" in v:
+            return '"%s"' % v
+        return "'%s'" % v if ' ' in v or v[0] in '_#$"[];' else v
+
+    f.write('data_structure\n#\nloop_\n')
+    for item in ('group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id', 'label_comp_id',
+                 'label_asym_id', 'label_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y', 'Cartn_z',
+                 'occupancy', 'B_iso_or_equiv', 'auth_seq_id', 'auth_comp_id', 'auth_asym_id',
+                 'auth_atom_id', 'pdbx_PDB_model_num'):
+        f.write('_atom_site.%s\n' % item)
+    for k in range(len(structure)):
+        x, y, z = structure.coord[k]
+        segi = structure.segi[k] or structure.chain[k]
+        f.write(' '.join([('HETATM' if structure.het[k] else 'ATOM'), str(k + 1), value(structure.element[k]),
+                          value(structure.name[k]), structure.alt[k] or '.', value(structure.resn[k]), value(segi),
+                          '.', structure.icode[k] or '?', '%.3f' % x, '%.3f' % y, '%.3f' % z, '1.00', '0.00',
+                          str(structure.resv[k]), value(structure.resn[k]), value(structure.chain[k]),
+                          value(structure.name[k]), '1']) + '\n')
+    f.write('#\n')
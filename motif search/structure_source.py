@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import os
+import gzip
+import collections
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from pymol import cmd
+from structure import find_structure, is_bcif, is_mmcif, load
+
+
+# a structure file found by StructureSource; data: its content, decompressed,
+# when it has been read ahead, else None and loaders stream it from path
+StructureFile = collections.namedtuple('StructureFile', ['pdb_id', 'path', 'data'], defaults=[None])
+# files up to this size (on disk) are read and decompressed when found;
+# larger ones are streamed from disk when they are loaded
+READ_AHEAD_BYTES = 16 * 1024**2
+
+
+class StructureSource:
+    """
+    StructureSource -- the structure files of a folder, flat (<id>.pdb,
+    <id>.cif.gz, ...) or in the divided layout of a wwPDB mirror
+    (xy/pdb1xyz.ent.gz), see structure.find_structure.
+
+    A mirror is used as it is: gzip files are never unpacked to disk.
+    read() reads a file and decompresses it in memory, so the structure
+    loaders and DSSP (dssp_cache.run_dssp) share one decompression of it.
+    prefetch() does this for the next files in a small thread pool while
+    the caller works on the current one (zlib releases the GIL), so on a
+    network filesystem the lookups, reads and decompression overlap the
+    search; at most depth + 1 files are held. Files over max_bytes are
+    only requested from the OS (posix_fadvise) and streamed, line by line,
+    when they are loaded.
+    """
+
+    def __init__(self, root, prefetch=4, max_bytes=READ_AHEAD_BYTES):
+        self.root = root
+        # files read ahead of the one in use, 0 to read each when asked for
+        self.depth = prefetch
+        self.max_bytes = max_bytes
+
+    def find(self, pdb_id):
+        return find_structure(self.root, pdb_id)
+
+    def read(self, pdb_id):
+        """ StructureFile of pdb_id with its decompressed content, or its pages requested from the OS if it is large; None if it has no file """
+        path = self.find(pdb_id)
+        if path is None:
+            return None
+        if os.path.getsize(path) <= self.max_bytes:
+            with (gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')) as f:
+                return StructureFile(pdb_id, path, f.read())
+        if hasattr(os, 'posix_fadvise'):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        return StructureFile(pdb_id, path)
+
+    def prefetch(self, pdb_ids):
+        """ (pdb_id, StructureFile or None) for each of pdb_ids in order, with up to depth files found and read ahead """
+        pdb_ids = iter(pdb_ids)
+        if self.depth < 1:
+            for pdb_id in pdb_ids:
+                yield pdb_id, self.read(pdb_id)
+            return
+        with ThreadPoolExecutor(self.depth) as pool:
+            pending = collections.deque((pdb_id, pool.submit(self.read, pdb_id)) for pdb_id in itertools.islice(pdb_ids, self.depth))
+            while pending:
+                pdb_id, future = pending.popleft()
+                for next_id in itertools.islice(pdb_ids, 1):
+                    pending.append((next_id, pool.submit(self.read, next_id)))
+                yield pdb_id, future.result()
+
+
+def load_pymol(structure_file, object_name='test'):
+    """ load a StructureFile into PyMOL, from its content when it has been read (else PyMOL reads the file, .gz too) """
+    if structure_file.data is None:
+        cmd.load(structure_file.path, object_name)
+    elif is_bcif(structure_file.path):
+        cmd.load_raw(structure_file.data, 'bcif', object_name)
+    else:
+        cmd.load_raw(structure_file.data.decode('latin-1'), 'cif' if is_mmcif(structure_file.path) else 'pdb', object_name)
+
+
+def load_structure(structure_file, chains=None):
+    """ structure.Structure of a StructureFile, from its content or streamed from its path, see structure.load """
+    return load(structure_file.path, chains, structure_file.data)
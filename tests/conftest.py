@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, 'motif search'), os.path.join(ROOT, 'bioinformatics'),
+                os.path.join(ROOT, 'bioinformatics', 'count_hydrophobic_interactions')]
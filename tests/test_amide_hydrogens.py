@@ -0,0 +1,40 @@
+import pytest
+
+pymol = pytest.importorskip('pymol')
+from pymol import cmd
+from hbond_geometry import ChainGeometry
+from motif_search import check_amide_hydrogens
+from structure import load
+
+# 1tii from PyMOL's demo structures: seven chains, prolines, chain breaks
+PATH = cmd.exp_path('$PYMOL_DATA/demo/1tii.pdb')
+# placed and h_add'ed hydrogens differ by float rounding only
+TOLERANCE = 0.001
+
+
+def _protonated():
+    """ chain models before h_add and ChainGeometry of every chain after it """
+    cmd.reinitialize()
+    cmd.load(PATH, 'test')
+    cmd.remove('solvent or ino. or org.')
+    chains = cmd.get_chains('test')
+    models = {chain_id: cmd.get_model('chain ' + chain_id) for chain_id in chains}
+    cmd.h_add('test')
+    return models, {chain_id: ChainGeometry('chain ' + chain_id) for chain_id in chains}
+
+
+def test_placed_hydrogens_match_h_add():
+    # N-termini carry two hydrogens after h_add and none placed; they are skipped
+    models, protonated = _protonated()
+    for chain_id, model in models.items():
+        placed = ChainGeometry(None, model=model, place_amide_h=True)
+        assert len(placed.amide_h) > 0
+        assert check_amide_hydrogens('1tii', chain_id, protonated[chain_id], placed, TOLERANCE) == []
+
+
+def test_numpy_hydrogens_match_h_add():
+    models, protonated = _protonated()
+    structure = load(PATH).strip().add_amide_hydrogens()
+    for chain_id in models:
+        placed = ChainGeometry(None, model=structure.chain_atoms(chain_id).get_model())
+        assert check_amide_hydrogens('1tii', chain_id, protonated[chain_id], placed, TOLERANCE) == []
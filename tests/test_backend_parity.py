@@ -0,0 +1,32 @@
+import pytest
+
+pymol = pytest.importorskip('pymol')
+from pymol import cmd
+from scipy.spatial import cKDTree
+import backend_parity
+from structure import load
+
+# PDB files shipped with PyMOL; 1tii chain H residue 41 (C1) is a motif at
+# the edge of the surface cutoff
+DEMO = cmd.exp_path('$PYMOL_DATA/demo')
+
+
+@pytest.mark.parametrize('pdb_id', ['1tii', 'pept'])
+def test_backends_agree(pdb_id):
+    total = backend_parity.backend_parity(DEMO, [pdb_id])
+    assert total['residues'] > 0 and total['starts'] > 0
+    assert {k: total[k] for k in ('class', 'surface', 'phi_psi', 'contacts')} == \
+           {'class': 0, 'surface': 0, 'phi_psi': 0, 'contacts': 0}
+
+
+def test_hydrogens_match_h_add():
+    path = DEMO + '/1tii.pdb'
+    structure = load(path).strip().add_hydrogens()
+    placed = structure.coord[structure.hydrogens()]
+    cmd.reinitialize()
+    cmd.load(path, 'test')
+    cmd.remove('solvent or ino. or org.')
+    cmd.h_add('test')
+    h_add = cmd.get_coords('test and hydro')
+    assert len(placed) == len(h_add)
+    assert cKDTree(placed).query(h_add)[0].max() < 0.005
@@ -0,0 +1,42 @@
+import shutil
+import numpy as np
+import pytest
+
+pymol = pytest.importorskip('pymol')
+from pymol import cmd
+from coord_store import CoordinateStore, compile_store
+from structure import Structure, load
+
+# PDB files shipped with PyMOL: 1tii (seven chains, a blank chain id,
+# waters and ligands), il2 (hydrogens) and pept
+DEMO = cmd.exp_path('$PYMOL_DATA/demo')
+PDB_IDS = ['1tii', 'il2', 'pept']
+
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory):
+    folder = tmp_path_factory.mktemp('pdb')
+    for pdb_id in PDB_IDS:
+        shutil.copy('%s/%s.pdb' % (DEMO, pdb_id), folder)
+    compile_store(str(folder), PDB_IDS, str(folder / 'store'))
+    return str(folder), CoordinateStore(str(folder / 'store'))
+
+
+def assert_same(stored, read):
+    assert len(stored) == len(read)
+    for f in Structure.FIELDS:
+        if f == 'coord':
+            # float32 in the store, as PyMOL keeps them
+            assert np.allclose(stored.coord, read.coord, atol=1e-4)
+        else:
+            assert np.array_equal(getattr(stored, f), getattr(read, f)), f
+
+
+@pytest.mark.parametrize('pdb_id', PDB_IDS)
+def test_store_round_trip(store, pdb_id):
+    folder, coords = store
+    path = '%s/%s.pdb' % (folder, pdb_id)
+    assert_same(coords.structure(pdb_id), load(path))
+    for chain_id in coords.chains(pdb_id):
+        assert_same(coords.structure(pdb_id, [chain_id]), load(path, [chain_id]))
+    assert coords.structure('none') is None
@@ -0,0 +1,37 @@
+import pytest
+
+pymol = pytest.importorskip('pymol')
+from pymol import cmd
+import candidate_table
+from cutoff_sweep import sweep_pdb, sweep_table
+from motif_classes import HBOND_CUTOFF, HBOND_MIN_ANGLE, MOTIF_RULES, family_donors
+from motif_search import search_pdb
+from structure import load
+
+# 1tii from PyMOL's demo structures, with ASX and ST motifs of most classes
+DEMO = cmd.exp_path('$PYMOL_DATA/demo')
+FAMILIES = ['ASX', 'ST']
+
+
+@pytest.mark.parametrize('backend', ['pymol', 'numpy'])
+def test_sweep_at_default_cutoffs_gives_search_classes(backend, tmp_path):
+    chain_ids = [c for c in load(DEMO + '/1tii.pdb').strip().chains() if c]
+    donors = family_donors(FAMILIES)
+    motifs = search_pdb(DEMO, '1tii', chain_ids, donors, backend=backend, tag_family=True)
+    # rows [pdb, chain, resi, class, family, ('surface')]
+    searched = {(m[1], str(m[2]), m[4], m[3]) for chain_motifs in motifs for m in chain_motifs}
+    table = candidate_table.concatenate(sweep_pdb(DEMO, '1tii', chain_ids, donors, backend))
+    counts = sweep_table(table, [HBOND_CUTOFF], [HBOND_MIN_ANGLE], str(tmp_path / 'sweep'))
+    ranks = candidate_table.classify_table(table, [HBOND_CUTOFF], [HBOND_MIN_ANGLE])[:, 0, 0]
+    names = [name for name, mask in MOTIF_RULES]
+    swept = {(chain, start, family, names[r]) for chain, start, family, r in
+             zip(table['chain'], table['start'], table['family'], ranks) if r >= 0}
+    assert len(searched) > 0
+    assert swept == searched
+    # the class column kept by the sweep is the search's too
+    kept = {(chain, start, family, name) for chain, start, family, name in
+            zip(table['chain'], table['start'], table['family'], table['class']) if name}
+    assert kept == searched
+    for family in FAMILIES:
+        row = counts[counts['family'] == family].iloc[0]
+        assert sum(row[name] for name in names) == sum(1 for m in searched if m[2] == family)
@@ -0,0 +1,73 @@
+import itertools
+import numpy as np
+from motif_classes import classify
+
+# the C1-C5 elif ladder of the original search_ASX/ST.py, in its order:
+# (class, s2, s3, m3, m4), True for a formed H-bond, False for a broken one
+LADDER = [
+    ('C1', True, False, True, False),
+    ('C2', True, False, True, True),
+    ('C2a', True, True, True, False),
+    ('C3', True, True, True, True),
+    ('C3a', False, True, True, False),
+    ('C4', True, True, False, True),
+    ('C4a', False, True, True, True),
+    ('C5', False, True, False, True),
+]
+
+# distances and angles at and around the 3.5 A / 140 degree cutoffs
+DISTANCES = [3.0, 3.4999, 3.5, 3.5001, 4.0]
+ANGLES = [120.0, 139.9999, 140.0, 140.0001, 170.0]
+BONDS = list(itertools.product(DISTANCES, ANGLES))
+# formed, broken, and on each cutoff, for the larger two-oxygen product
+FEW_BONDS = [(3.0, 160.0), (4.0, 160.0), (3.0, 120.0), (3.5, 160.0), (3.0, 140.0)]
+
+
+def _formed(d, a):
+    return d < 3.5 and a >= 140
+
+
+def _broken(d, a):
+    return d > 3.5 or a < 140
+
+
+def ladder(s2, s3, m3, m4):
+    """ class of the original ladder; s2/s3 list one (distance, angle) per side-chain oxygen, tried in turn """
+    for name, *pattern in LADDER:
+        for oxygen in range(len(s2)):
+            bonds = [s2[oxygen], s3[oxygen], m3, m4]
+            if all(_formed(*b) if f else _broken(*b) for b, f in zip(bonds, pattern)):
+                return name
+    return None
+
+
+def _compare(atoms, bonds):
+    # every combination of the bonds of one candidate: 2 per side-chain oxygen, m3 and m4
+    combos = np.array(list(itertools.product(range(len(bonds)), repeat=2 * len(atoms) + 2)))
+    values = np.array(bonds)[combos]
+    hbonds = {'m3': (values[:, -2, 0], values[:, -2, 1]), 'm4': (values[:, -1, 0], values[:, -1, 1])}
+    for k, atom in enumerate(atoms):
+        hbonds['s2_' + atom] = (values[:, 2 * k, 0], values[:, 2 * k, 1])
+        hbonds['s3_' + atom] = (values[:, 2 * k + 1, 0], values[:, 2 * k + 1, 1])
+    labels, error = classify(hbonds, atoms)
+    assert not error.any()
+    for row, label in zip(values, labels):
+        s2 = [tuple(row[2 * k]) for k in range(len(atoms))]
+        s3 = [tuple(row[2 * k + 1]) for k in range(len(atoms))]
+        assert label == ladder(s2, s3, tuple(row[-2]), tuple(row[-1])), row
+
+
+def test_rule_table_matches_ladder_one_oxygen():
+    _compare(['OD1'], BONDS)
+
+
+def test_rule_table_matches_ladder_two_oxygens():
+    # Asp: the ladder tries OD1 then OD2 for each class before the next class
+    _compare(['OD1', 'OD2'], FEW_BONDS)
+
+
+def test_missing_atom_has_no_class():
+    nan = np.array([np.nan])
+    ok = (np.array([3.0]), np.array([160.0]))
+    labels, error = classify({'s2_OG': ok, 's3_OG': (nan, nan), 'm3': ok, 'm4': ok}, ['OG'])
+    assert error[0] and labels == [None]
@@ -0,0 +1,93 @@
+import collections
+import numpy as np
+import pytest
+import motif_store
+from journal import csv_cells
+from motif_annotation import ASX_WINDOWS, annotate_motif
+from motif_informatics import dihedral_statistics, residue_abundance, secondary_structure
+from structure import DIHEDRALS, RESIDUE
+
+# a chain of 40 residues with DSSP codes missing for some of them and phi/psi
+# undefined at the termini and at a chain break; motifs (start, class) in its
+# middle and at both ends, so some windows are cut short
+LENGTH = 40
+MOTIFS = [(0, 'C1'), (3, 'C1'), (6, 'C5'), (9, 'C1'), (12, 'C5'), (15, 'C5'), (18, 'C1'),
+          (21, 'C1'), (24, 'C5'), (27, 'C5'), (30, 'C1'), (38, 'C5')]
+
+
+def _chain():
+    rng = np.random.default_rng(7)
+    table = np.zeros(LENGTH, dtype=RESIDUE)
+    table['resv'] = np.arange(1, LENGTH + 1)
+    table['resi'] = table['resv'].astype(str)
+    table['resn'] = rng.choice(['ALA', 'ASP', 'GLY', 'LEU', 'PRO', 'SER'], LENGTH)
+    angles = np.zeros(LENGTH, dtype=DIHEDRALS)
+    angles['ca'] = np.arange(LENGTH) * 8 + 2
+    # spread of a few degrees, so circular and arithmetic means agree
+    angles['phi'] = rng.normal(-63, 4, LENGTH)
+    angles['psi'] = rng.normal(-42, 4, LENGTH)
+    angles['phi'][[0, 20]] = np.nan
+    angles['psi'][[19, LENGTH - 1]] = np.nan
+    codes = rng.choice(['H', 'E', 'T', '-'], LENGTH).tolist()
+    dssp = {('A', (' ', int(resv), ' ')): code for resv, code in zip(table['resv'], codes) if resv % 7}
+    return table, angles, dssp
+
+
+def _annotated():
+    """ motif records and the csv cells get_seq_sec_dihed writes for them """
+    table, angles, dssp = _chain()
+    records = motif_store.motif_records([['test', 'A', str(p + 1), name] for p, name in MOTIFS], 'ASX')
+    rows = []
+    for record, (p, name) in zip(records, MOTIFS):
+        sequence, secondary, phi_psi = annotate_motif(record, table, angles, dssp, 'A', p, **ASX_WINDOWS)
+        rows.append(csv_cells(['test', 'A', p + 1, name, 'not surface', sequence, secondary, phi_psi]))
+    return records, rows
+
+
+def _abundance(values):
+    counts = collections.Counter(values)
+    return {key: n / len(values) for key, n in counts.items()}
+
+
+def test_secondary_structure_matches_notebook():
+    records, rows = _annotated()
+    ratios = secondary_structure(records, 'ASX')
+    for name in ('C1', 'C5'):
+        # the notebook's Counter over the secondary-structure column
+        expected = _abundance([row[6] for row in rows if row[3] == name])
+        assert any('Missing' in key for key in expected)
+        assert ratios[name].to_dict() == pytest.approx(expected)
+
+
+def test_residue_abundance_matches_notebook():
+    records, rows = _annotated()
+    ratios = residue_abundance(records, 'ASX')
+    for name in ('C1', 'C5'):
+        sequences = [[a.strip(" '") for a in row[5].strip('[]').split(',')] for row in rows if row[3] == name]
+        # the notebook skips the motifs with a window cut short
+        sequences = [a for a in sequences if len(a) == 8]
+        assert 0 < len(sequences) < sum(1 for p, c in MOTIFS if c == name)
+        for k, offset in enumerate(range(*ASX_WINDOWS['sequence'])):
+            assert ratios[name][offset].to_dict() == pytest.approx(_abundance([a[k] for a in sequences]))
+
+
+def test_dihedral_statistics_match_notebook():
+    records, rows = _annotated()
+    stats = dihedral_statistics(records)
+    for name in ('C1', 'C5'):
+        # the notebook's parsing of the phi_psi column; motifs with fewer
+        # than seven phi/psi pairs are left out
+        dih = []
+        for row in rows:
+            data = row[7].split(',')
+            pairs = [[float(data[j].replace('(', '').replace('[', '')), float(data[j + 1].replace(')', '').replace(']', ''))]
+                     for j in range(len(data)) if (j - 2) % 4 == 0]
+            if row[3] == name and len(pairs) == 7:
+                dih.append(pairs)
+        dih = np.array(dih)
+        assert 0 < len(dih) < sum(1 for p, c in MOTIFS if c == name)
+        for k, offset in enumerate(range(-1, 6)):
+            row = stats.loc[(name, offset)]
+            assert row['n'] == len(dih)
+            assert row['phi_mean'] == pytest.approx(np.average(dih[:, k, 0]), abs=0.05)
+            assert row['psi_mean'] == pytest.approx(np.average(dih[:, k, 1]), abs=0.05)
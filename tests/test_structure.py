@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+pymol = pytest.importorskip('pymol')
+from pymol import cmd
+from structure import load, write_mmcif
+
+# 1tii from PyMOL's demo structures: seven chains, waters and ligands
+PATH = cmd.exp_path('$PYMOL_DATA/demo/1tii.pdb')
+
+
+@pytest.mark.parametrize('fmt', ['pdb', 'cif'])
+def test_chain_filter_keeps_file_index(fmt, tmp_path):
+    path = PATH
+    if fmt == 'cif':
+        path = str(tmp_path / '1tii.cif')
+        write_mmcif(load(PATH), path)
+    whole = load(path)
+    stripped = whole.strip()
+    for chain_id in whole.chains():
+        chain = load(path, [chain_id])
+        assert np.array_equal(chain.index, whole.index[whole.chain == chain_id])
+        # strip shifts each atom down by the atoms removed before it, as
+        # cmd.remove; 1tii's waters and ligands all follow its chains
+        assert np.array_equal(chain.strip().index, stripped.index[stripped.chain == chain_id])